@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Bulk ingestion of a directory of PDFs into the Customer Support Knowledge Base
+
+Uses PDFService and KnowledgeService directly instead of the HTTP API. Several
+documents are ingested at once, with PDF parsing and chunking spread across
+the ingestion worker processes. Progress is checkpointed after every document,
+so running the same command again after a crash resumes where it stopped.
+
+Usage:
+    python bulk_ingest.py ../pdf-files --category "Product X" --concurrency 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict
+
+
+def load_checkpoint(path: Path) -> Dict[str, Any]:
+    """Load the checkpoint file, or start a new one"""
+    if path.exists():
+        with open(path) as f:
+            return json.load(f)
+    return {"files": {}}
+
+
+def save_checkpoint(path: Path, checkpoint: Dict[str, Any]):
+    """Write the checkpoint atomically so a crash never leaves it half written"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def rate(count: int, seconds: float) -> float:
+    return round(count / seconds, 2) if seconds > 0 else 0.0
+
+
+async def bulk_ingest(args: argparse.Namespace) -> int:
+    from services.knowledge_service import KnowledgeService
+    from services.pdf_service import PDFService
+
+    directory = Path(args.directory)
+    pattern = "**/*.pdf" if args.recursive else "*.pdf"
+    files = sorted(str(path.resolve()) for path in directory.glob(pattern))
+    if not files:
+        print(f"No PDF files found in {directory}")
+        return 1
+
+    checkpoint_path = Path(args.checkpoint)
+    checkpoint = {"files": {}} if args.restart else load_checkpoint(checkpoint_path)
+    entries = checkpoint["files"]
+    pending = [path for path in files if entries.get(path, {}).get("status") != "done"]
+    print(f"Found {len(files)} PDF files, {len(files) - len(pending)} already ingested, {len(pending)} to go")
+    if not pending:
+        return 0
+
+    knowledge_service = KnowledgeService()
+    pdf_service = PDFService()
+    pdf_service.set_knowledge_service(knowledge_service)
+
+    slots = asyncio.Semaphore(args.concurrency)
+    totals = {"docs": 0, "skipped": 0, "failed": 0, "pages": 0, "chunks": 0}
+    started = time.perf_counter()
+
+    async def ingest(path: str):
+        async with slots:
+            entry = entries.setdefault(path, {})
+            # Reuse the document id of an interrupted attempt: chunks it already
+            # embedded are content-addressed and are not embedded again
+            entry.setdefault("document_id", str(uuid.uuid4()))
+            entry["status"] = "started"
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            doc_started = time.perf_counter()
+            try:
+                document_id = await pdf_service.process_and_ingest_pdf(
+                    file_path=path,
+                    document_name=Path(path).stem.replace("_", " ").title(),
+                    category=args.category,
+                    document_id=entry["document_id"]
+                )
+            except Exception as e:
+                entry["status"] = "failed"
+                entry["error"] = str(e)
+                totals["failed"] += 1
+                print(f"FAILED  {path}: {e}")
+            else:
+                document_info = knowledge_service.get_document(document_id) or {}
+                stats = document_info.get("ingestion_stats") or {}
+                if document_id != entry["document_id"]:
+                    totals["skipped"] += 1  # Identical content was already in the knowledge base
+                else:
+                    totals["docs"] += 1
+                    totals["pages"] += stats.get("pages", 0)
+                    totals["chunks"] += stats.get("chunks", 0)
+                entry.pop("error", None)
+                entry.update(status="done", document_id=document_id, stats=stats)
+                print(
+                    f"OK      {path} -> {document_id} "
+                    f"({stats.get('pages', 0)} pages, {stats.get('chunks', 0)} chunks, "
+                    f"{time.perf_counter() - doc_started:.1f}s)"
+                )
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    try:
+        await asyncio.gather(*(ingest(path) for path in pending))
+    finally:
+        await knowledge_service.shutdown()
+
+    elapsed = time.perf_counter() - started
+    print()
+    print(f"Ingested {totals['docs']} documents, {totals['skipped']} duplicates skipped, {totals['failed']} failed")
+    print(f"Elapsed: {elapsed:.1f}s")
+    print(f"Throughput: {rate(totals['docs'], elapsed)} docs/sec, "
+          f"{rate(totals['pages'], elapsed)} pages/sec, {rate(totals['chunks'], elapsed)} chunks/sec")
+    return 1 if totals["failed"] else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory of PDFs into the knowledge base")
+    parser.add_argument("directory", help="Directory containing the PDF files")
+    parser.add_argument("--category", default=None, help="Category assigned to every document")
+    parser.add_argument("--recursive", action="store_true", help="Include PDFs in subdirectories")
+    parser.add_argument("--concurrency", type=int, default=4, help="Documents ingested at the same time (default: 4)")
+    parser.add_argument("--process-workers", type=int, default=None,
+                        help="Worker processes for PDF parsing and chunking (default: INGEST_PROCESS_WORKERS)")
+    parser.add_argument("--checkpoint", default="data/bulk_ingest_checkpoint.json",
+                        help="Checkpoint file used to resume an interrupted run")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and process every file")
+    args = parser.parse_args()
+
+    # Settings are read when the services are imported
+    if args.process_workers:
+        os.environ["INGEST_PROCESS_WORKERS"] = str(args.process_workers)
+
+    return asyncio.run(bulk_ingest(args))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -21,10 +21,79 @@ API_WORKERS = int(os.getenv("API_WORKERS", "1"))
 # OpenAI settings
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# LLM settings
+LLM_MODEL_ID = os.getenv("LLM_MODEL_ID", "gpt-4o")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "120"))
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "16"))
+AGENT_POOL_MAX_RUNS = int(os.getenv("AGENT_POOL_MAX_RUNS", "200"))  # Runs before an agent is replaced
+
 # Vector database settings
 VECTOR_DB_TABLE = os.getenv("VECTOR_DB_TABLE", "customer_support_kb")
 VECTOR_DB_URI = str(LANCEDB_DIR)
 
+# Answer cache settings
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))  # 0 disables the cache
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+
+# Query embedding cache settings (in-process LRU shared by all search paths)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))  # 0 disables the cache
+
+# Semantic answer cache settings (stored in its own LanceDB table)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_TABLE = os.getenv("SEMANTIC_CACHE_TABLE", "customer_support_kb_answer_cache")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))  # Oldest entries are evicted beyond this; 0 disables the limit
+
+# RAG prompt settings
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))  # Estimated tokens of retrieved context per prompt
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("CONTEXT_DUPLICATE_THRESHOLD", "0.8"))  # Jaccard overlap treated as duplicate
+
+# Batch query settings
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "500"))
+QUERY_BATCH_CONCURRENCY = int(os.getenv("QUERY_BATCH_CONCURRENCY", "8"))
+
+# Ingestion job settings
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))  # Concurrent background ingestion jobs
+INGEST_MAX_QUEUE_SIZE = int(os.getenv("INGEST_MAX_QUEUE_SIZE", "100"))
+INGEST_PROCESS_WORKERS = int(os.getenv("INGEST_PROCESS_WORKERS", "2"))  # Processes for PDF parsing and chunking
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "25"))  # Minimum pages per parallel extraction task
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))  # Maximum characters per chunk
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))  # Characters repeated from the previous chunk
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # Chunks per embedding request and LanceDB write
+EMBED_BATCH_RETRIES = int(os.getenv("EMBED_BATCH_RETRIES", "3"))  # Retries of a failed batch before ingestion fails
+EMBED_RETRY_BACKOFF_SECONDS = float(os.getenv("EMBED_RETRY_BACKOFF_SECONDS", "1.0"))  # Doubles after each retry
+INGEST_JOBS_RETAINED = int(os.getenv("INGEST_JOBS_RETAINED", "1000"))  # Finished jobs kept for status polling
+
+# Persistent document registry (document records and chunk text)
+REGISTRY_PATH = os.getenv("REGISTRY_PATH", "data/registry.db")
+MIGRATION_DROP_UNOWNED_ROWS = os.getenv("MIGRATION_DROP_UNOWNED_ROWS", "false").lower() == "true"  # Delete rows without a document_id when migrating an old table
+
+# Persistent embedding cache for document chunks, keyed by model and chunk hash
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.db")
+
+# LanceDB index management
+INDEX_MIN_ROWS = int(os.getenv("INDEX_MIN_ROWS", "100000"))  # Rows before an IVF-PQ index replaces brute-force search
+INDEX_REBUILD_AFTER_ROWS = int(os.getenv("INDEX_REBUILD_AFTER_ROWS", "50000"))  # New rows that trigger a rebuild
+INDEX_NPROBES = int(os.getenv("INDEX_NPROBES", "20"))  # IVF partitions searched per query
+
+# LanceDB fragment compaction and version cleanup
+COMPACTION_MIN_SMALL_FRAGMENTS = int(os.getenv("COMPACTION_MIN_SMALL_FRAGMENTS", "16"))  # Small fragments that trigger a background compaction
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "3600"))  # Scheduled compaction and version cleanup; 0 disables
+LANCEDB_VERSION_RETENTION_SECONDS = float(os.getenv("LANCEDB_VERSION_RETENTION_SECONDS", "86400"))  # Table versions older than this are pruned
+
+# Retrieval ranking
+RETRIEVAL_RANKER = os.getenv("RETRIEVAL_RANKER", "rrf")  # "rrf" (local fusion of vector and keyword search) or "lancedb" (built-in hybrid)
+RRF_K = int(os.getenv("RRF_K", "60"))  # Rank offset in 1 / (k + rank); larger values flatten the rank curve
+RRF_VECTOR_WEIGHT = float(os.getenv("RRF_VECTOR_WEIGHT", "1.0"))  # Weight of the vector search ranks
+RRF_KEYWORD_WEIGHT = float(os.getenv("RRF_KEYWORD_WEIGHT", "1.0"))  # Weight of the full-text search ranks
+RRF_CANDIDATE_MULTIPLIER = int(os.getenv("RRF_CANDIDATE_MULTIPLIER", "4"))  # Candidates per source, as a multiple of max_results
+RECENCY_BOOST = float(os.getenv("RECENCY_BOOST", "0.0"))  # Score boost for a just-uploaded document, halving every half-life; 0 disables
+RECENCY_HALF_LIFE_DAYS = float(os.getenv("RECENCY_HALF_LIFE_DAYS", "180"))  # Age at which the recency boost is halved
+CATEGORY_BOOST = float(os.getenv("CATEGORY_BOOST", "0.0"))  # Score boost for documents whose category is named in the query; 0 disables
+
 # File upload settings
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", "50")) * 1024 * 1024  # 50MB default
 ALLOWED_EXTENSIONS = {".pdf"}
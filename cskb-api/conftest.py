@@ -0,0 +1,75 @@
+"""
+Fixtures for the knowledge service tests: a KnowledgeService on a temporary data
+directory whose embeddings are computed locally instead of by the OpenAI API.
+"""
+
+import hashlib
+import math
+import types
+
+import pytest
+
+
+def fake_embedding(text, dimensions=1536):
+    """Bag-of-words vector: texts sharing words are similar, like real embeddings"""
+    vector = [0.0] * dimensions
+    for word in str(text).lower().split():
+        vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % dimensions] += 1.0
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def fake_response(self, text):
+    texts = text if isinstance(text, list) else [text]
+    data = [types.SimpleNamespace(embedding=fake_embedding(t), index=i) for i, t in enumerate(texts)]
+    return types.SimpleNamespace(data=data, usage=None)
+
+
+@pytest.fixture
+def service_environment(tmp_path, monkeypatch):
+    """Temporary data directory and local embeddings, without a KnowledgeService yet"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    from agno.embedder.openai import OpenAIEmbedder
+    monkeypatch.setattr(OpenAIEmbedder, "response", fake_response)
+    return tmp_path
+
+
+def make_knowledge_service():
+    from services.knowledge_service import KnowledgeService
+    service = KnowledgeService()
+
+    # Chunk in-process instead of in the ingestion process pool
+    async def run_inline(fn, *args):
+        return fn(*args)
+    service._run_in_ingest_pool = run_inline
+    return service
+
+
+def close_knowledge_service(service):
+    service.registry.close()
+    if service.embedding_cache:
+        service.embedding_cache.close()
+
+
+@pytest.fixture
+def knowledge_service(service_environment):
+    service = make_knowledge_service()
+    yield service
+    close_knowledge_service(service)
+
+
+def use_text(service, text):
+    """Make the service read text instead of parsing a PDF"""
+    async def extract(file_path, progress_callback=None):
+        return text, {"pages": 1}
+    service.extract_pdf_text_parallel = extract
+
+
+async def ingest_text(service, document_id, text, **document_info):
+    """Ingest text as a document, as PDFService does for an uploaded PDF"""
+    use_text(service, text)
+    service.add_document(document_id, {"id": document_id, "status": "uploaded", **document_info})
+    stats = await service.add_document_to_knowledge_base(document_id, f"{document_id}.pdf")
+    service.add_document(document_id, {**service.get_document(document_id), "status": "ingested"})
+    return stats
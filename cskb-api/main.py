@@ -1,15 +1,26 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+from datetime import datetime
 import os
+import json
+import asyncio
 import tempfile
 import shutil
 from pathlib import Path
 
+from config import (
+    QUERY_BATCH_MAX_SIZE,
+    INGEST_WORKERS,
+    INGEST_MAX_QUEUE_SIZE,
+    INGEST_JOBS_RETAINED,
+)
 from services.knowledge_service import KnowledgeService
-from services.pdf_service import PDFService
+from services.pdf_service import PDFService, file_sha256
+from services.ingestion_jobs import IngestionJobQueue
+from services.search_filters import SearchFilters
 
 app = FastAPI(
     title="Customer Support Knowledge Base API",
@@ -33,8 +44,54 @@ pdf_service = PDFService()
 # Set up service references
 pdf_service.set_knowledge_service(knowledge_service)
 
-class QueryRequest(BaseModel):
+# Background ingestion workers
+ingestion_jobs = IngestionJobQueue(
+    pdf_service,
+    workers=INGEST_WORKERS,
+    max_queue_size=INGEST_MAX_QUEUE_SIZE,
+    max_jobs_retained=INGEST_JOBS_RETAINED
+)
+
+@app.on_event("startup")
+async def startup():
+    """Start ingestion workers, the LanceDB maintenance scheduler and the keyword index build, and warm up pooled agents before serving traffic"""
+    await ingestion_jobs.start()
+    await knowledge_service.start_maintenance_scheduler()
+    knowledge_service.start_keyword_index_build()
+    await knowledge_service.warm_up()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop ingestion workers and close pooled LLM connections"""
+    await ingestion_jobs.stop()
+    await knowledge_service.shutdown()
+
+class FilteredRequest(BaseModel):
+    """Optional metadata filters; retrieval only considers matching documents"""
+    category: Optional[str] = None
+    document_ids: Optional[List[str]] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+    
+    def filters(self) -> Optional[SearchFilters]:
+        return SearchFilters.create(
+            category=self.category,
+            document_ids=self.document_ids,
+            uploaded_after=self.uploaded_after,
+            uploaded_before=self.uploaded_before
+        )
+
+class QueryRequest(FilteredRequest):
+    query: str
+    user_id: Optional[str] = "default_user"
+    max_results: Optional[int] = 5
+
+class SearchRequest(FilteredRequest):
     query: str
+    max_results: Optional[int] = 5
+
+class BatchQueryRequest(FilteredRequest):
+    queries: List[str]
     user_id: Optional[str] = "default_user"
     max_results: Optional[int] = 5
 
@@ -42,41 +99,136 @@ class IngestResponse(BaseModel):
     message: str
     document_id: str
     status: str
+    job_id: Optional[str] = None
 
-@app.post("/ingest/pdf", response_model=IngestResponse)
+@app.post("/ingest/pdf", response_model=IngestResponse, status_code=202)
 async def ingest_pdf(
+    response: Response,
     file: UploadFile = File(...),
     document_name: str = Form(...),
-    category: Optional[str] = Form(None)
+    category: Optional[str] = Form(None),
+    wait: bool = Form(False)
 ):
-    """Ingest a PDF document into the knowledge base"""
+    """Queue a PDF document for ingestion into the knowledge base.
+    
+    Returns 202 with a job id right away; poll GET /ingest/jobs/{job_id} for
+    progress. With wait=true the request blocks until ingestion has finished.
+    """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="File must be a PDF")
     
     try:
-        # Save uploaded file temporarily
+        # Save uploaded file temporarily; the ingestion job deletes it when done
         with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
             shutil.copyfileobj(file.file, tmp_file)
             tmp_path = tmp_file.name
         
-        # Process and ingest the PDF
-        document_id = await pdf_service.process_and_ingest_pdf(
-            file_path=tmp_path,
-            document_name=document_name,
-            category=category
+        try:
+            # Hashed up front so a duplicate's 202 already carries the existing document_id
+            content_hash = await asyncio.to_thread(file_sha256, tmp_path)
+            job = ingestion_jobs.submit(
+                file_path=tmp_path,
+                document_name=document_name,
+                category=category,
+                content_hash=content_hash
+            )
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Failed to queue PDF: {str(e)}")
+    
+    if not wait:
+        return IngestResponse(
+            message="PDF accepted for ingestion",
+            document_id=job["document_id"],
+            status="queued",
+            job_id=job["id"]
         )
+    
+    job = await ingestion_jobs.wait(job["id"])
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Failed to ingest PDF: {'; '.join(job['errors'])}")
+    
+    response.status_code = 200
+    message = "PDF successfully ingested"
+    if job["deduplicated"]:
+        message = "PDF already ingested"
+        if job["ignored_fields"]:
+            message += f"; kept the existing document's {' and '.join(job['ignored_fields'])}"
+    return IngestResponse(
+        message=message,
+        document_id=job["document_id"],
+        status="success",
+        job_id=job["id"]
+    )
+
+@app.put("/documents/{document_id}", response_model=IngestResponse, status_code=202)
+async def update_document(
+    document_id: str,
+    response: Response,
+    file: UploadFile = File(...),
+    document_name: Optional[str] = Form(None),
+    category: Optional[str] = Form(None),
+    wait: bool = Form(False)
+):
+    """Upload a new version of an ingested document.
+    
+    Only chunks that changed are re-embedded. Like /ingest/pdf this runs as a
+    background job unless wait=true.
+    """
+    if not file.filename.endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="File must be a PDF")
+    if not knowledge_service.get_document(document_id):
+        raise HTTPException(status_code=404, detail=f"Document not found: {document_id}")
+    
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
+            shutil.copyfileobj(file.file, tmp_file)
+            tmp_path = tmp_file.name
         
-        # Clean up temp file
-        os.unlink(tmp_path)
-        
+        try:
+            job = ingestion_jobs.submit(
+                file_path=tmp_path,
+                document_name=document_name,
+                category=category,
+                update_document_id=document_id
+            )
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Failed to queue PDF: {str(e)}")
+    
+    if not wait:
         return IngestResponse(
-            message="PDF successfully ingested",
+            message="PDF accepted for update",
             document_id=document_id,
-            status="success"
+            status="queued",
+            job_id=job["id"]
         )
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to ingest PDF: {str(e)}")
+    job = await ingestion_jobs.wait(job["id"])
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Failed to update document: {'; '.join(job['errors'])}")
+    
+    response.status_code = 200
+    return IngestResponse(
+        message="Document successfully updated",
+        document_id=document_id,
+        status="success",
+        job_id=job["id"]
+    )
+
+@app.get("/ingest/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Get the status and progress of an ingestion job"""
+    job = ingestion_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Ingestion job not found: {job_id}")
+    return ingestion_jobs.public_view(job)
 
 @app.post("/query")
 async def query_knowledge(request: QueryRequest):
@@ -85,18 +237,129 @@ async def query_knowledge(request: QueryRequest):
         response = await knowledge_service.query(
             query=request.query,
             user_id=request.user_id,
-            max_results=request.max_results
+            max_results=request.max_results,
+            filters=request.filters()
         )
         return JSONResponse(content=response)
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
+@app.post("/search")
+async def search_knowledge(request: SearchRequest):
+    """Retrieve ranked chunks from the knowledge base without generating an answer"""
+    try:
+        response = await knowledge_service.search(
+            query=request.query,
+            max_results=request.max_results,
+            filters=request.filters()
+        )
+        return JSONResponse(content=response)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+@app.post("/query/batch")
+async def query_knowledge_batch(request: BatchQueryRequest):
+    """Query the knowledge base with many queries at once"""
+    if len(request.queries) > QUERY_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries: {len(request.queries)} (maximum {QUERY_BATCH_MAX_SIZE})"
+        )
+    
+    try:
+        results = await knowledge_service.query_batch(
+            queries=request.queries,
+            user_id=request.user_id,
+            max_results=request.max_results,
+            filters=request.filters()
+        )
+        failed = sum(1 for item in results if item["status"] == "error")
+        return JSONResponse(content={
+            "results": results,
+            "total": len(results),
+            "succeeded": len(results) - failed,
+            "failed": failed
+        })
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch query failed: {str(e)}")
+
+@app.post("/query/stream")
+async def query_knowledge_stream(request: QueryRequest):
+    """Query the knowledge base, streaming sources and answer tokens as server-sent events"""
+    async def event_stream():
+        try:
+            async for event, data in knowledge_service.query_stream(
+                query=request.query,
+                user_id=request.user_id,
+                max_results=request.max_results,
+                filters=request.filters()
+            ):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'Query failed: {str(e)}'})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "Customer Support Knowledge Base API"}
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Answer cache statistics"""
+    return await knowledge_service.get_cache_stats()
+
+@app.get("/admin/index")
+async def index_state(probe: int = 0):
+    """LanceDB index state; with probe=N, recall and latency of indexed vs exact search over N sample queries"""
+    try:
+        return await knowledge_service.get_index_state(probe_queries=min(probe, 100))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read index state: {str(e)}")
+
+@app.post("/admin/index/rebuild")
+async def rebuild_index():
+    """Rebuild the LanceDB vector and full-text indexes now"""
+    try:
+        return await knowledge_service.rebuild_indexes()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild indexes: {str(e)}")
+
+@app.get("/admin/compaction")
+async def compaction_state():
+    """Fragment, version and file counts of the LanceDB tables, the last runs and the maintenance schedule"""
+    try:
+        return await knowledge_service.get_compaction_state()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to read compaction state: {str(e)}")
+
+@app.post("/admin/compaction/run")
+async def run_compaction():
+    """Compact the LanceDB tables and prune old versions now, regardless of the fragment threshold"""
+    try:
+        return await knowledge_service.run_maintenance()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compact table: {str(e)}")
+
+@app.delete("/documents/{document_id}")
+async def delete_document(document_id: str):
+    """Remove a document, its uploaded PDF and its chunks in the vector database"""
+    try:
+        removed = await pdf_service.remove_document(document_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"Document not found: {document_id}")
+    return {"message": "Document removed", "document_id": document_id}
+
 @app.get("/documents")
 async def list_documents():
     """List all ingested documents"""
@@ -0,0 +1,142 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+from agno.agent import Agent
+from agno.models.openai import OpenAIChat
+
+
+class AgentPool:
+    """Pool of long-lived agents that share one keep-alive HTTP client.
+
+    Agents are handed out exclusively for the duration of a run and returned
+    afterwards, so the OpenAI client and its pooled TLS connections are reused
+    across requests instead of being rebuilt on every query. Agents keep run
+    history in memory, so each one is replaced after ``max_runs_per_agent`` runs.
+    """
+
+    def __init__(
+        self,
+        size: int = 16,
+        model_id: str = "gpt-4o",
+        max_runs_per_agent: int = 200,
+        timeout_seconds: float = 60,
+        keepalive_seconds: float = 120
+    ):
+        self.size = size
+        self.model_id = model_id
+        self.max_runs_per_agent = max_runs_per_agent
+        self.timeout_seconds = timeout_seconds
+        self.keepalive_seconds = keepalive_seconds
+
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._idle: "asyncio.Queue[Agent]" = asyncio.Queue()
+        self._runs: Dict[int, int] = {}  # Runs served per agent, keyed by id(agent)
+        self._generation: Dict[int, int] = {}  # Pool generation each agent was created in
+        self._current_generation = 0
+        self._created = 0
+
+        self.runs_served = 0
+        self.agents_created = 0
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                timeout=self.timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=self.size * 2,
+                    max_keepalive_connections=self.size,
+                    keepalive_expiry=self.keepalive_seconds
+                )
+            )
+        return self._http_client
+
+    def _create_agent(self) -> Agent:
+        model = OpenAIChat(id=self.model_id, http_client=self._get_http_client())
+        agent = Agent(
+            model=model,
+            search_knowledge=False,  # We're doing manual retrieval
+            show_tool_calls=False,
+        )
+        self._runs[id(agent)] = 0
+        self._generation[id(agent)] = self._current_generation
+        self._created += 1
+        self.agents_created += 1
+        return agent
+
+    def _discard(self, agent: Agent):
+        self._runs.pop(id(agent), None)
+        self._generation.pop(id(agent), None)
+        self._created -= 1
+
+    async def _checkout(self) -> Agent:
+        try:
+            return self._idle.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+
+        if self._created < self.size:
+            return self._create_agent()
+
+        # Pool is exhausted, wait for a running agent to be released
+        return await self._idle.get()
+
+    def _checkin(self, agent: Agent):
+        self._runs[id(agent)] = self._runs.get(id(agent), 0) + 1
+        self.runs_served += 1
+
+        if (
+            self._generation.get(id(agent)) != self._current_generation
+            or self._runs[id(agent)] >= self.max_runs_per_agent
+        ):
+            # Replace rather than shrink so callers waiting on the queue are not starved
+            self._discard(agent)
+            agent = self._create_agent()
+
+        self._idle.put_nowait(agent)
+
+    @asynccontextmanager
+    async def acquire(self, user_id: str = "default_user") -> AsyncIterator[Agent]:
+        """Borrow an agent for a single run"""
+        agent = await self._checkout()
+        agent.user_id = user_id
+        try:
+            yield agent
+        finally:
+            self._checkin(agent)
+
+    async def warm_up(self):
+        """Create the pool's agents and open a keep-alive connection to the LLM API"""
+        while self._created < self.size:
+            self._idle.put_nowait(self._create_agent())
+
+        agent = await self._checkout()
+        try:
+            await agent.model.get_async_client().models.list()
+        finally:
+            self._idle.put_nowait(agent)
+
+    async def clear(self):
+        """Drop all pooled agents; agents currently running are discarded when released"""
+        self._current_generation += 1
+        while not self._idle.empty():
+            self._discard(self._idle.get_nowait())
+
+    async def close(self):
+        """Drop all agents and close the shared HTTP client"""
+        await self.clear()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool size and usage counters"""
+        return {
+            "size": self.size,
+            "model_id": self.model_id,
+            "agents": self._created,
+            "idle": self._idle.qsize(),
+            "runs_served": self.runs_served,
+            "agents_created": self.agents_created,
+        }
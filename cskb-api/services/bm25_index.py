@@ -0,0 +1,109 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+ChunkKey = Tuple[str, int]  # (document_id, chunk index)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index over document chunks with BM25 scoring.
+
+    Chunks are tokenized once at ingest time; documents can be added and removed
+    incrementally, and a search only touches the postings of the query terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[ChunkKey, int]] = {}  # term -> {chunk: term frequency}
+        self.chunk_lengths: Dict[ChunkKey, int] = {}
+        self.chunk_terms: Dict[ChunkKey, List[str]] = {}  # chunk -> its distinct terms, used for removal
+        self.document_chunk_counts: Dict[str, int] = {}
+        self.total_length = 0
+
+    def add_document(self, document_id: str, chunks: List[str]):
+        """Index (or re-index) every chunk of a document"""
+        if document_id in self.document_chunk_counts:
+            self.remove_document(document_id)
+
+        for i, chunk in enumerate(chunks):
+            key = (document_id, i)
+            counts = Counter(tokenize(chunk))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, {})[key] = frequency
+            self.chunk_terms[key] = list(counts)
+            length = sum(counts.values())
+            self.chunk_lengths[key] = length
+            self.total_length += length
+
+        self.document_chunk_counts[document_id] = len(chunks)
+
+    def remove_document(self, document_id: str):
+        """Drop every chunk of a document from the index.
+
+        Only the postings of each chunk's own terms are touched, so removal costs
+        about as much as adding the document did.
+        """
+        chunk_count = self.document_chunk_counts.pop(document_id, None)
+        if chunk_count is None:
+            return
+
+        for i in range(chunk_count):
+            key = (document_id, i)
+            for term in self.chunk_terms.pop(key, ()):
+                postings = self.postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(key, None)
+                if not postings:
+                    del self.postings[term]
+            self.total_length -= self.chunk_lengths.pop(key, 0)
+
+    def search(
+        self,
+        query: str,
+        limit: int,
+        document_ids: Optional[Set[str]] = None
+    ) -> List[Tuple[ChunkKey, float]]:
+        """Return the highest scoring chunks for a query as ((document_id, chunk index), score) pairs.
+
+        With document_ids only chunks of those documents are scored.
+        """
+        chunk_count = len(self.chunk_lengths)
+        if not chunk_count:
+            return []
+
+        average_length = self.total_length / chunk_count or 1.0
+        scores: Dict[ChunkKey, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+
+            document_frequency = len(postings)
+            idf = math.log(1 + (chunk_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            for key, frequency in postings.items():
+                if document_ids is not None and key[0] not in document_ids:
+                    continue
+                length_norm = 1 - self.b + self.b * self.chunk_lengths[key] / average_length
+                scores[key] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def stats(self) -> Dict[str, int]:
+        """Return index size"""
+        return {
+            "documents": len(self.document_chunk_counts),
+            "chunks": len(self.chunk_lengths),
+            "terms": len(self.postings),
+        }
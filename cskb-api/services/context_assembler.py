@@ -0,0 +1,106 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, List, Optional, Set, Tuple
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    """Approximate the number of LLM tokens in a piece of text"""
+    return math.ceil(len(text) / chars_per_token) if text else 0
+
+
+@dataclass
+class ContextChunk:
+    """A retrieved chunk selected for the RAG prompt"""
+
+    item: Any  # The retrieved object the content came from
+    content: str
+    score: float
+    tokens: int
+    truncated: bool = False
+
+
+class ContextAssembler:
+    """Packs retrieved chunks into a token budget for the RAG prompt.
+
+    Chunks are taken in descending score order, near-duplicates of an already
+    selected chunk are skipped, and the first chunk that does not fit is trimmed
+    at a sentence boundary before assembly stops.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 3000,
+        duplicate_threshold: float = 0.8,
+        chars_per_token: float = 4.0
+    ):
+        self.token_budget = token_budget
+        self.duplicate_threshold = duplicate_threshold
+        self.chars_per_token = chars_per_token
+
+    def _tokens(self, text: str) -> int:
+        return estimate_tokens(text, self.chars_per_token)
+
+    @staticmethod
+    def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+        words = WORD_PATTERN.findall(text.lower())
+        if len(words) < size:
+            return {tuple(words)}
+        return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def _is_duplicate(self, shingles: Set[Tuple[str, ...]], selected: List[Set[Tuple[str, ...]]]) -> bool:
+        for other in selected:
+            union = len(shingles | other)
+            if union and len(shingles & other) / union >= self.duplicate_threshold:
+                return True
+        return False
+
+    def _trim_to_budget(self, content: str, budget: int) -> Optional[str]:
+        """Keep the leading whole sentences of content that fit in the budget"""
+        kept = []
+        used = 0
+        for sentence in SENTENCE_BOUNDARY.split(content):
+            tokens = self._tokens(sentence) + 1
+            if used + tokens > budget:
+                break
+            kept.append(sentence)
+            used += tokens
+        return " ".join(kept) if kept else None
+
+    def assemble(self, chunks: List[Tuple[Any, str, float]]) -> Tuple[List[ContextChunk], int]:
+        """Select chunks for the prompt.
+
+        Takes ``(item, content, score)`` tuples and returns the selected chunks in
+        prompt order together with the estimated number of tokens they use.
+        """
+        selected: List[ContextChunk] = []
+        selected_shingles: List[Set[Tuple[str, ...]]] = []
+        used = 0
+
+        # sorted() is stable, so equal scores keep their retrieval order
+        for item, content, score in sorted(chunks, key=lambda chunk: chunk[2], reverse=True):
+            shingles = self._shingles(content)
+            if self._is_duplicate(shingles, selected_shingles):
+                continue
+
+            tokens = self._tokens(content)
+            if used + tokens <= self.token_budget:
+                selected.append(ContextChunk(item=item, content=content, score=score, tokens=tokens))
+                selected_shingles.append(shingles)
+                used += tokens
+                continue
+
+            trimmed = self._trim_to_budget(content, self.token_budget - used)
+            if trimmed is None and not selected:
+                # Never send an empty context because the best chunk has no short sentence
+                trimmed = content[:int(self.token_budget * self.chars_per_token)]
+            if trimmed:
+                tokens = self._tokens(trimmed)
+                selected.append(ContextChunk(item=item, content=trimmed, score=score, tokens=tokens, truncated=True))
+                used += tokens
+            break
+
+        return selected, used
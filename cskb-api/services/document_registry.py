@@ -0,0 +1,153 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class DocumentRegistry:
+    """SQLite store for document records and chunk text.
+
+    LanceDB only holds vectors, payloads and the columns retrieval filters on, so the document list, the chunk text
+    used by the keyword index and the chunk -> row id mapping live here and
+    survive restarts. Reads are cheap enough to happen lazily on first use.
+
+    A chunk's position and character offsets change when a document is updated
+    while its LanceDB row is kept, so they are only recorded here.
+    """
+
+    def __init__(self, path: str = "data/registry.db"):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        # One connection shared by the event loop and worker threads, serialized by a lock
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA foreign_keys=ON")
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    info TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chunks (
+                    document_id TEXT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    row_id TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    start_offset INTEGER,
+                    end_offset INTEGER,
+                    PRIMARY KEY (document_id, position)
+                );
+                CREATE INDEX IF NOT EXISTS chunks_row_id ON chunks(row_id);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                );
+            """)
+            # Registries created before offsets were recorded
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(chunks)")}
+            for column in ("start_offset", "end_offset"):
+                if column not in columns:
+                    self._connection.execute(f"ALTER TABLE chunks ADD COLUMN {column} INTEGER")
+
+    def load_documents(self) -> Dict[str, Dict[str, Any]]:
+        """Return all document records by id"""
+        with self._lock:
+            rows = self._connection.execute("SELECT id, info FROM documents ORDER BY rowid").fetchall()
+        return {document_id: json.loads(info) for document_id, info in rows}
+
+    def save_document(self, document_id: str, document_info: Dict[str, Any]):
+        """Insert or replace a document record"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO documents (id, info) VALUES (?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET info = excluded.info",
+                (document_id, json.dumps(document_info))
+            )
+
+    def delete_document(self, document_id: str):
+        """Delete a document record and its chunks"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+
+    def save_chunks(
+        self,
+        document_id: str,
+        chunks: List[str],
+        row_ids: List[str],
+        spans: List[Tuple[int, int]]
+    ):
+        """Replace the stored chunks of a document; spans are their (start, end) offsets in the document text"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            self._connection.executemany(
+                "INSERT INTO chunks (document_id, position, row_id, content, start_offset, end_offset) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (document_id, i, row_id, chunk, start, end)
+                    for i, (chunk, row_id, (start, end)) in enumerate(zip(chunks, row_ids, spans))
+                )
+            )
+
+    def get_row_ids(self, document_id: str) -> List[str]:
+        """Return the LanceDB row ids of a document's chunks in chunk order"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT row_id FROM chunks WHERE document_id = ? ORDER BY position", (document_id,)
+            ).fetchall()
+        return [row_id for (row_id,) in rows]
+
+    def chunk_positions(
+        self,
+        keys: Iterable[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], Tuple[int, Optional[int], Optional[int]]]:
+        """Return (position, start_offset, end_offset) by (document_id, row_id).
+
+        A row that occurs more than once in a document maps to its first position.
+        """
+        positions = {}
+        with self._lock:
+            for document_id, row_id in set(keys):
+                row = self._connection.execute(
+                    "SELECT position, start_offset, end_offset FROM chunks "
+                    "WHERE document_id = ? AND row_id = ? ORDER BY position LIMIT 1",
+                    (document_id, row_id)
+                ).fetchone()
+                if row:
+                    positions[(document_id, row_id)] = row
+        return positions
+
+    def iter_chunks(self) -> Iterator[Tuple[str, List[str]]]:
+        """Yield (document_id, chunks) for every stored document"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT document_id, content FROM chunks ORDER BY document_id, position"
+            ).fetchall()
+        current_id, current_chunks = None, []
+        for document_id, content in rows:
+            if document_id != current_id:
+                if current_id is not None:
+                    yield current_id, current_chunks
+                current_id, current_chunks = document_id, []
+            current_chunks.append(content)
+        if current_id is not None:
+            yield current_id, current_chunks
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Read a value from the meta table"""
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str):
+        """Write a value to the meta table"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,75 @@
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+class EmbeddingCache:
+    """On-disk cache of document embeddings keyed by embedder model and chunk hash.
+
+    Re-ingesting, re-uploading or rebuilding the vector table sends the same chunk
+    text to the embedding provider again; with this cache only chunks never seen
+    before by the model are embedded. Vectors are stored as packed float32.
+    """
+
+    def __init__(self, path: str = "data/embedding_cache.db"):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()  # Ingestion embeds from worker threads
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    chunk_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, chunk_hash)
+                ) WITHOUT ROWID
+            """)
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, chunk_hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Return the cached vectors among chunk_hashes"""
+        chunk_hashes = list(dict.fromkeys(chunk_hashes))
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for start in range(0, len(chunk_hashes), 500):
+                batch = chunk_hashes[start:start + 500]
+                placeholders = ", ".join("?" for _ in batch)
+                rows = self._connection.execute(
+                    f"SELECT chunk_hash, vector FROM embeddings WHERE model = ? AND chunk_hash IN ({placeholders})",
+                    (model, *batch)
+                ).fetchall()
+                for chunk_hash, blob in rows:
+                    found[chunk_hash] = array("f", blob).tolist()
+            self.hits += len(found)
+            self.misses += len(chunk_hashes) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Iterable[Tuple[str, List[float]]]):
+        """Store (chunk_hash, vector) pairs"""
+        rows = [(model, chunk_hash, array("f", vector).tobytes()) for chunk_hash, vector in items]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, chunk_hash, vector) VALUES (?, ?, ?)", rows
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count and hit rate"""
+        with self._lock:
+            (entries,) = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,107 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from agno.embedder.base import Embedder
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    """Cosine similarity of two vectors"""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return float(dot / norm) if norm else 0.0
+
+
+def normalize_embedding_text(text: str) -> str:
+    """Collapse whitespace so trivially different query strings share an embedding"""
+    return " ".join(text.split())
+
+
+class CachingEmbedder(Embedder):
+    """Embedder wrapper with an in-process LRU cache of query embeddings.
+
+    LanceDb embeds queries through get_embedding and documents through
+    get_embedding_and_usage, so only the former is cached: every search path
+    (vector, hybrid, semantic answer cache) shares one cache of hot queries while
+    ingestion does not evict them. Callers that know their queries up front can
+    prefetch them with a single batched request.
+    """
+
+    def __init__(self, embedder: Embedder, max_entries: int = 2048):
+        self.embedder = embedder
+        self.dimensions = embedder.dimensions
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()  # Searches embed from worker threads
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def model_key(self) -> str:
+        """Identifies the embedding model, for caches that outlive the process"""
+        model_id = getattr(self.embedder, "id", None) or type(self.embedder).__name__
+        return f"{model_id}:{self.dimensions}"
+
+    def _get_cached(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._cache.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def _set_cached(self, key: str, embedding: List[float]):
+        if self.max_entries <= 0 or not embedding:
+            return
+        with self._lock:
+            self._cache[key] = embedding
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts, in one request when the underlying embedder supports it"""
+        if not texts:
+            return []
+
+        # OpenAIEmbedder.response accepts a list input and returns one item per text
+        if hasattr(self.embedder, "response"):
+            response = self.embedder.response(texts)
+            data = sorted(response.data, key=lambda item: item.index)
+            return [item.embedding for item in data]
+
+        return [self.embedder.get_embedding(text) for text in texts]
+
+    def prefetch(self, texts: Iterable[str]):
+        """Embed uncached query texts in one batched request and cache the vectors"""
+        keys = list(dict.fromkeys(normalize_embedding_text(text) for text in texts))
+        with self._lock:
+            missing = [key for key in keys if key not in self._cache]
+        for key, embedding in zip(missing, self.embed_batch(missing)):
+            self._set_cached(key, embedding)
+
+    def get_embedding(self, text: str) -> List[float]:
+        key = normalize_embedding_text(text)
+        embedding = self._get_cached(key)
+        if embedding is None:
+            embedding = self.embedder.get_embedding(key)
+            self._set_cached(key, embedding)
+        return embedding
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.embedder.get_embedding_and_usage(text)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return query embedding cache size and hit rate"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._cache),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
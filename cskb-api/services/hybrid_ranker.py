@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .bm25_index import tokenize
+
+
+class HybridRanker:
+    """Fuses vector and keyword search results with weighted reciprocal-rank fusion.
+
+    Each source contributes weight / (k + rank) for every chunk it returned, so
+    only ranks matter and the two sources' incomparable raw scores (cosine
+    similarity, BM25) never have to be normalized. The fused score is then
+    multiplied by optional boosts for recently uploaded documents and for
+    documents whose category is named in the query.
+    """
+
+    def __init__(
+        self,
+        k: int = 60,
+        vector_weight: float = 1.0,
+        keyword_weight: float = 1.0,
+        recency_boost: float = 0.0,
+        recency_half_life_days: float = 180,
+        category_boost: float = 0.0
+    ):
+        self.k = k
+        self.vector_weight = vector_weight
+        self.keyword_weight = keyword_weight
+        self.recency_boost = recency_boost
+        self.recency_half_life_days = recency_half_life_days
+        self.category_boost = category_boost
+
+    def _recency_multiplier(self, document_info: Dict[str, Any], now: datetime) -> float:
+        if not self.recency_boost:
+            return 1.0
+        timestamp = document_info.get("updated_at") or document_info.get("uploaded_at")
+        if not timestamp:
+            return 1.0
+        age_days = max(0.0, (now - datetime.fromisoformat(timestamp)).total_seconds() / 86400)
+        return 1.0 + self.recency_boost * 0.5 ** (age_days / self.recency_half_life_days)
+
+    def _category_multiplier(self, document_info: Dict[str, Any], query_terms: set) -> float:
+        category_terms = set(tokenize(document_info.get("category") or ""))
+        if self.category_boost and category_terms and category_terms <= query_terms:
+            return 1.0 + self.category_boost
+        return 1.0
+
+    def fuse(
+        self,
+        query: str,
+        vector_hits: List[Tuple[str, float]],
+        keyword_hits: List[Tuple[str, float]],
+        documents: Dict[str, Optional[Dict[str, Any]]],
+        limit: int
+    ) -> List[Tuple[str, float, Dict[str, Any]]]:
+        """Rank chunks found by either source.
+
+        vector_hits and keyword_hits are (chunk id, raw score) pairs in rank order;
+        documents maps each chunk id to its document record, used for the boosts.
+        Returns (chunk id, fused score, per-source scores) for the best chunks.
+        """
+        scores: Dict[str, Dict[str, Any]] = {}
+        for source, hits, weight in (
+            ("vector", vector_hits, self.vector_weight),
+            ("keyword", keyword_hits, self.keyword_weight)
+        ):
+            for rank, (chunk_id, raw_score) in enumerate(hits, start=1):
+                entry = scores.setdefault(chunk_id, {"rrf": 0.0})
+                if f"{source}_rank" in entry:
+                    continue  # A chunk can only be ranked once per source
+                entry[f"{source}_rank"] = rank
+                entry[f"{source}_score"] = round(raw_score, 4) if raw_score is not None else None
+                entry["rrf"] += weight / (self.k + rank)
+
+        now = datetime.utcnow()
+        query_terms = set(tokenize(query))
+        ranked = []
+        for chunk_id, entry in scores.items():
+            document_info = documents.get(chunk_id) or {}
+            recency = self._recency_multiplier(document_info, now)
+            category = self._category_multiplier(document_info, query_terms)
+            score = entry["rrf"] * recency * category
+            entry["rrf"] = round(entry["rrf"], 6)
+            if recency != 1.0:
+                entry["recency_boost"] = round(recency, 4)
+            if category != 1.0:
+                entry["category_boost"] = round(category, 4)
+            ranked.append((chunk_id, score, entry))
+
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
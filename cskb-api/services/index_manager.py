@@ -0,0 +1,270 @@
+import math
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from lancedb.index import FTS, Bitmap, BTree
+
+# Scalar indexes on the columns metadata filters prefilter on
+SCALAR_INDEXES = {"document_id": BTree, "category": Bitmap, "uploaded_at": BTree}
+# Full-text index on the chunk text alone, not the JSON payload with its metadata
+FTS_COLUMN = "content"
+
+
+class IndexManager:
+    """Builds and refreshes the ANN vector index and the full-text index of a LanceDb table.
+
+    Small tables are searched by brute force, which is exact and fast enough. Once
+    the table passes min_rows an IVF-PQ index is trained on the vector column, and
+    both indexes are rebuilt after rebuild_after_rows further rows have been
+    added, so new chunks do not accumulate in the unindexed (scanned) tail.
+    The scalar indexes of the filter columns are created as soon as the table
+    has rows.
+    """
+
+    def __init__(
+        self,
+        vector_db,
+        min_rows: int = 100000,
+        rebuild_after_rows: int = 50000,
+        nprobes: int = 20
+    ):
+        self.vector_db = vector_db
+        self.min_rows = min_rows
+        self.rebuild_after_rows = rebuild_after_rows
+        self.nprobes = nprobes
+        self.metric = getattr(getattr(vector_db, "distance", None), "value", "cosine")
+        self.vector_db.nprobes = nprobes  # Applied by LanceDb to every search once an index exists
+
+        self._lock = threading.Lock()  # One build at a time; searches never wait on it
+        self._fts_lock = threading.Lock()
+        self.building = False
+        self.indexed_rows: Optional[int] = None  # Row count when the vector index was last built
+        self.last_build: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None  # Vector index build error
+        self.last_fts_build: Optional[Dict[str, Any]] = None
+        self.last_fts_error: Optional[str] = None
+
+    @property
+    def table(self):
+        return self.vector_db.table
+
+    def _indices(self) -> List[Any]:
+        try:
+            return list(self.table.list_indices())
+        except Exception:
+            return []
+
+    def _find_index(self, column: str) -> Optional[Any]:
+        for index in self._indices():
+            if column in index.columns:
+                return index
+        return None
+
+    def vector_index(self) -> Optional[Any]:
+        return self._find_index("vector")
+
+    def fts_index(self) -> Optional[Any]:
+        return self._find_index(FTS_COLUMN)
+
+    def ensure_fts_index(self):
+        """Create the full-text index hybrid search needs, unless the table already has one"""
+        if self.vector_db.fts_index_exists:
+            return
+        with self._fts_lock:
+            if self.vector_db.fts_index_exists:
+                return
+            if self.fts_index() is None:
+                self._create_fts_index()
+            self.vector_db.fts_index_exists = True
+
+    def _create_fts_index(self):
+        # LanceDB's native inverted index; the tantivy-based index has been removed from LanceDB
+        self.table.create_index(FTS_COLUMN, config=FTS(), replace=True)
+        # Earlier versions indexed the JSON payload, whose metadata matched as keywords
+        payload_index = self._find_index("payload")
+        if payload_index is not None:
+            self.table.drop_index(payload_index.name)
+
+    def ensure_scalar_indexes(self):
+        """Create the scalar indexes of filter columns that do not have one yet.
+
+        Rows added later are folded into them whenever the table is optimized.
+        """
+        try:
+            if self.table.count_rows() == 0:
+                return
+            indexed = {column for index in self._indices() for column in index.columns}
+            for column, config in SCALAR_INDEXES.items():
+                if column not in indexed and column in self.table.schema.names:
+                    self.table.create_index(column, config=config(), replace=True)
+        except Exception as e:
+            print(f"Warning: Could not create LanceDB scalar indexes: {e}")
+
+    def needs_build(self, row_count: int) -> bool:
+        if row_count < self.min_rows:
+            return False
+        if self.indexed_rows is None:
+            index = self.vector_index()
+            if index is None:
+                return True
+            # Index built by an earlier process: count what it does not cover
+            self.indexed_rows = row_count - self._unindexed_rows(index)
+        return row_count - self.indexed_rows >= self.rebuild_after_rows
+
+    def _unindexed_rows(self, index: Any) -> int:
+        try:
+            return self.table.index_stats(index.name).num_unindexed_rows
+        except Exception:
+            return 0
+
+    def maybe_build(self, force: bool = False) -> bool:
+        """Build or rebuild the indexes if the table has grown enough; returns whether either index was built"""
+        if not self._lock.acquire(blocking=False):
+            return False  # A build is already running
+        try:
+            row_count = self.table.count_rows()
+            if not force and not self.needs_build(row_count):
+                return False
+            return self._build(row_count)
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Warning: Could not build LanceDB indexes: {e}")
+            return False
+        finally:
+            self._lock.release()
+
+    def _build(self, row_count: int) -> bool:
+        """Build the vector index and the full-text index; a failure of one does not skip the other"""
+        self.building = True
+        built = False
+        try:
+            try:
+                self._build_vector_index(row_count)
+                built = True
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Warning: Could not build LanceDB vector index: {e}")
+            try:
+                self._build_fts_index(row_count)
+                built = True
+            except Exception as e:
+                self.last_fts_error = str(e)
+                print(f"Warning: Could not build LanceDB full-text index: {e}")
+            return built
+        finally:
+            self.building = False
+
+    def _build_vector_index(self, row_count: int):
+        if row_count < 256:
+            raise Exception(f"Too few rows to train a vector index: {row_count}")
+        started = time.perf_counter()
+        dimensions = self.vector_db.dimensions
+        num_partitions = max(1, int(math.sqrt(row_count)))
+        # PQ sub-vectors must divide the dimension; 16 dimensions per sub-vector
+        num_sub_vectors = max(1, dimensions // 16) if dimensions % 16 == 0 else 1
+        self.table.create_index(
+            metric=self.metric,
+            num_partitions=num_partitions,
+            num_sub_vectors=num_sub_vectors,
+            vector_column_name="vector",
+            index_type="IVF_PQ",
+            replace=True
+        )
+        # Inserts and deletes look rows up by "id IN (...)"; a scalar index avoids scanning every row for it
+        self.table.create_index("id", config=BTree(), replace=True)
+
+        self.indexed_rows = row_count
+        self.last_error = None
+        self.last_build = {
+            "rows": row_count,
+            "num_partitions": num_partitions,
+            "num_sub_vectors": num_sub_vectors,
+            "seconds": round(time.perf_counter() - started, 2),
+            "finished_at": datetime.utcnow().isoformat()
+        }
+
+    def _build_fts_index(self, row_count: int):
+        started = time.perf_counter()
+        with self._fts_lock:
+            self._create_fts_index()
+            self.vector_db.fts_index_exists = True
+        self.last_fts_error = None
+        self.last_fts_build = {
+            "rows": row_count,
+            "seconds": round(time.perf_counter() - started, 2),
+            "finished_at": datetime.utcnow().isoformat()
+        }
+
+    def _search(self, vector: List[float], limit: int, exact: bool) -> List[str]:
+        query = self.table.search(vector, vector_column_name="vector").metric(self.metric).limit(limit).select(["id"])
+        if exact:
+            query = query.bypass_vector_index()
+        else:
+            query = query.nprobes(self.nprobes)
+        return query.to_arrow()["id"].to_pylist()
+
+    def probe(self, queries: int = 10, limit: int = 10) -> Dict[str, Any]:
+        """Measure recall@limit and latency of indexed search against exact search.
+
+        Uses the vectors of sampled stored chunks as queries.
+        """
+        sample = self.table.search().select(["vector"]).limit(queries).to_arrow()["vector"].to_pylist()
+        if not sample:
+            return {"queries": 0}
+
+        recalls, indexed_ms, exact_ms = [], [], []
+        for vector in sample:
+            started = time.perf_counter()
+            approximate = self._search(vector, limit, exact=False)
+            indexed_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            exact = self._search(vector, limit, exact=True)
+            exact_ms.append((time.perf_counter() - started) * 1000)
+
+            if exact:
+                recalls.append(len(set(approximate) & set(exact)) / len(exact))
+
+        def summarize(values: List[float]) -> Dict[str, float]:
+            ordered = sorted(values)
+            return {
+                "mean": round(sum(ordered) / len(ordered), 2),
+                "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2)
+            }
+
+        return {
+            "queries": len(sample),
+            "k": limit,
+            "recall_at_k": round(sum(recalls) / len(recalls), 4) if recalls else None,
+            "indexed_latency_ms": summarize(indexed_ms),
+            "exact_latency_ms": summarize(exact_ms)
+        }
+
+    def state(self) -> Dict[str, Any]:
+        """Return row counts, index details and thresholds"""
+        indices = []
+        for index in self._indices():
+            entry = {"name": index.name, "type": str(index.index_type), "columns": list(index.columns)}
+            try:
+                stats = self.table.index_stats(index.name)
+                entry["indexed_rows"] = stats.num_indexed_rows
+                entry["unindexed_rows"] = stats.num_unindexed_rows
+            except Exception:
+                pass
+            indices.append(entry)
+
+        return {
+            "rows": self.table.count_rows(),
+            "indices": indices,
+            "search": "ann" if self.vector_index() is not None else "brute_force",
+            "min_rows": self.min_rows,
+            "rebuild_after_rows": self.rebuild_after_rows,
+            "nprobes": self.nprobes,
+            "building": self.building,
+            "last_build": self.last_build,
+            "last_error": self.last_error,
+            "last_fts_build": self.last_fts_build,
+            "last_fts_error": self.last_fts_error
+        }
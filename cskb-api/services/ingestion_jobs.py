@@ -0,0 +1,208 @@
+import asyncio
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .pdf_service import PDFService
+
+
+class IngestionJobQueue:
+    """Background queue of PDF ingestion jobs.
+
+    Uploads are queued and processed by a fixed number of worker tasks, so an
+    ingestion no longer has to finish within the lifetime of the HTTP request that
+    submitted it. Each job records its progress (pages parsed, chunks embedded)
+    and any errors, and can be polled by id.
+    """
+
+    def __init__(
+        self,
+        pdf_service: PDFService,
+        workers: int = 2,
+        max_queue_size: int = 100,
+        max_jobs_retained: int = 1000
+    ):
+        self.pdf_service = pdf_service
+        self.workers = workers
+        self.max_jobs_retained = max_jobs_retained
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=max_queue_size)
+        self.jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Start the worker tasks"""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._worker(), name=f"ingestion-worker-{i}")
+                for i in range(self.workers)
+            ]
+
+    async def stop(self):
+        """Stop the worker tasks; queued jobs that have not started are left queued"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(
+        self,
+        file_path: str,
+        document_name: Optional[str],
+        category: Optional[str] = None,
+        delete_file: bool = True,
+        update_document_id: Optional[str] = None,
+        content_hash: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Queue a PDF for ingestion and return its job record.
+
+        With update_document_id the PDF is a new version of that document and only
+        its changed chunks are re-embedded. With delete_file the (temporary) file at
+        file_path is removed once the job has finished. content_hash, the SHA-256 of
+        a new upload, resolves the job's document_id to the existing document when
+        identical content is already ingested or queued.
+        """
+        job_id = str(uuid.uuid4())
+        document_id = update_document_id
+        if not document_id and content_hash:
+            document_id = self._document_id_for_content(content_hash)
+        job = {
+            "id": job_id,
+            "operation": "update" if update_document_id else "ingest",
+            "document_id": document_id or str(uuid.uuid4()),
+            "document_name": document_name,
+            "category": category,
+            "content_hash": content_hash,
+            "file_path": file_path,
+            "delete_file": delete_file,
+            "status": "queued",
+            "progress": {
+                "pages_total": None,
+                "pages_parsed": 0,
+                "chunks_total": None,
+                "chunks_embedded": 0
+            },
+            "errors": [],
+            "result": None,
+            "deduplicated": False,
+            "ignored_fields": {},
+            "created_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "finished_at": None
+        }
+
+        try:
+            self.queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            raise Exception("Ingestion queue is full, try again later")
+
+        self.jobs[job_id] = job
+        self._prune()
+        return job
+
+    def _document_id_for_content(self, content_hash: str) -> Optional[str]:
+        """document_id of an ingested document or queued upload with identical content"""
+        existing = self.pdf_service.knowledge_service.find_document_by_hash(content_hash)
+        if existing:
+            return existing["id"]
+        for job in self.jobs.values():
+            if (
+                job["operation"] == "ingest"
+                and job["content_hash"] == content_hash
+                and job["status"] in ("queued", "running")
+            ):
+                return job["document_id"]
+        return None
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job record by id"""
+        return self.jobs.get(job_id)
+
+    async def wait(self, job_id: str, poll_interval: float = 0.2) -> Dict[str, Any]:
+        """Wait until a job has finished and return its record"""
+        while self.jobs[job_id]["status"] in ("queued", "running"):
+            await asyncio.sleep(poll_interval)
+        return self.jobs[job_id]
+
+    def public_view(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Job record without internal fields"""
+        return {
+            key: value for key, value in job.items()
+            if key not in ("file_path", "delete_file", "content_hash")
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and job counts by status"""
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {"workers": self.workers, "queued": self.queue.qsize(), "jobs": counts}
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the retention limit"""
+        excess = len(self.jobs) - self.max_jobs_retained
+        for job_id in list(self.jobs):
+            if excess <= 0:
+                break
+            if self.jobs[job_id]["status"] in ("succeeded", "failed"):
+                del self.jobs[job_id]
+                excess -= 1
+
+    def _progress_callback(self, job: Dict[str, Any]):
+        def update(**updates):
+            error = updates.pop("error", None)
+            if error:
+                job["errors"].append(error)
+            job["progress"].update(updates)
+        return update
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is not None:
+                    await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: Dict[str, Any]):
+        job["status"] = "running"
+        job["started_at"] = datetime.utcnow().isoformat()
+        try:
+            if job["operation"] == "update":
+                document_id = await self.pdf_service.update_document(
+                    document_id=job["document_id"],
+                    file_path=job["file_path"],
+                    document_name=job["document_name"],
+                    category=job["category"],
+                    progress_callback=self._progress_callback(job)
+                )
+            else:
+                # Identical content that was already ingested resolves to the existing document
+                document_id, job["deduplicated"] = await self.pdf_service.ingest_pdf(
+                    file_path=job["file_path"],
+                    document_name=job["document_name"],
+                    category=job["category"],
+                    document_id=job["document_id"],
+                    progress_callback=self._progress_callback(job),
+                    content_hash=job["content_hash"]
+                )
+            job["document_id"] = document_id
+            job["result"] = self.pdf_service.knowledge_service.get_document(document_id)
+            if job["deduplicated"]:
+                # The existing document keeps its own name and category
+                job["ignored_fields"] = {
+                    field: job[field]
+                    for field, key in (("document_name", "name"), ("category", "category"))
+                    if job[field] is not None and job[field] != job["result"].get(key)
+                }
+            job["status"] = "succeeded"
+        except Exception as e:
+            job["errors"].append(str(e))
+            job["status"] = "failed"
+        finally:
+            job["finished_at"] = datetime.utcnow().isoformat()
+            if job["delete_file"] and os.path.exists(job["file_path"]):
+                os.unlink(job["file_path"])
@@ -1,18 +1,102 @@
 import asyncio
-from typing import Dict, List, Any, Optional
-from agno.agent import Agent
+import json
+from hashlib import md5
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple, Callable, Iterable, Set
 from agno.knowledge.agent import Document
+from agno.run.response import RunEvent
 from agno.vectordb.lancedb import LanceDb
 from agno.vectordb.search import SearchType
+import pyarrow as pa
 import uuid
 import os
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
-import PyPDF2
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .agent_pool import AgentPool
+from .answer_cache import AnswerCache, normalize_query
+from .bm25_index import BM25Index
+from .context_assembler import ContextAssembler
+from .document_registry import DocumentRegistry
+from .embedding_cache import EmbeddingCache
+from .embeddings import CachingEmbedder, cosine_similarity
+from .hybrid_ranker import HybridRanker
+from .index_manager import IndexManager
+from .search_filters import SearchFilters, sql_string
+from .semantic_cache import SemanticAnswerCache
+from .single_flight import SingleFlight
+from .table_maintenance import TableMaintenance
+from .text_extraction import (
+    chunk_text,
+    chunk_text_spans,
+    count_pdf_pages,
+    extract_pdf_pages,
+    extract_pdf_text,
+    join_pages,
+    split_page_ranges,
+)
+
+# Columns the knowledge base table has besides LanceDb's (vector, id, payload), so
+# metadata filters run as LanceDB prefilters on scalar-indexed columns
+DOCUMENT_COLUMNS = [
+    pa.field("document_id", pa.string()),
+    pa.field("category", pa.string()),
+    pa.field("uploaded_at", pa.timestamp("us")),
+]
+
+# The chunk text on its own, so the full-text index does not match the metadata in payload
+CONTENT_COLUMN = pa.field("content", pa.string())
 
 class KnowledgeService:
     def __init__(self):
         # Check if OpenAI API key is available
-        from config import OPENAI_API_KEY
+        from config import (
+            OPENAI_API_KEY,
+            ANSWER_CACHE_MAX_ENTRIES,
+            ANSWER_CACHE_TTL_SECONDS,
+            SEMANTIC_CACHE_ENABLED,
+            SEMANTIC_CACHE_TABLE,
+            SEMANTIC_CACHE_THRESHOLD,
+            SEMANTIC_CACHE_TTL_SECONDS,
+            SEMANTIC_CACHE_MAX_ENTRIES,
+            LLM_MODEL_ID,
+            LLM_TIMEOUT_SECONDS,
+            LLM_KEEPALIVE_SECONDS,
+            AGENT_POOL_SIZE,
+            AGENT_POOL_MAX_RUNS,
+            QUERY_BATCH_CONCURRENCY,
+            QUERY_EMBEDDING_CACHE_SIZE,
+            CONTEXT_TOKEN_BUDGET,
+            CONTEXT_DUPLICATE_THRESHOLD,
+            INGEST_PROCESS_WORKERS,
+            PDF_PAGES_PER_TASK,
+            EMBED_BATCH_SIZE,
+            EMBED_BATCH_RETRIES,
+            EMBED_RETRY_BACKOFF_SECONDS,
+            REGISTRY_PATH,
+            MIGRATION_DROP_UNOWNED_ROWS,
+            CHUNK_SIZE,
+            CHUNK_OVERLAP,
+            EMBEDDING_CACHE_ENABLED,
+            EMBEDDING_CACHE_PATH,
+            INDEX_MIN_ROWS,
+            INDEX_REBUILD_AFTER_ROWS,
+            INDEX_NPROBES,
+            COMPACTION_MIN_SMALL_FRAGMENTS,
+            MAINTENANCE_INTERVAL_SECONDS,
+            LANCEDB_VERSION_RETENTION_SECONDS,
+            RETRIEVAL_RANKER,
+            RRF_K,
+            RRF_VECTOR_WEIGHT,
+            RRF_KEYWORD_WEIGHT,
+            RRF_CANDIDATE_MULTIPLIER,
+            RECENCY_BOOST,
+            RECENCY_HALF_LIFE_DAYS,
+            CATEGORY_BOOST,
+        )
         if not OPENAI_API_KEY:
             raise Exception("OPENAI_API_KEY environment variable is required")
         
@@ -20,237 +104,1421 @@ class KnowledgeService:
             table_name="customer_support_kb",
             uri="data/lancedb",
             search_type=SearchType.hybrid,
+            use_tantivy=False,
+        )
+        
+        # Wrap the embedder so every search path shares one cache of query embeddings
+        # and batches of queries can be embedded in one request
+        self.embedder = CachingEmbedder(self.vector_db.embedder, max_entries=QUERY_EMBEDDING_CACHE_SIZE)
+        self.vector_db.embedder = self.embedder
+        
+        # Persistent cache of chunk embeddings, so re-ingesting unchanged content costs no embedding calls
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        if EMBEDDING_CACHE_ENABLED:
+            self.embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+        
+        # Vector (IVF-PQ) and full-text indexes, built once the table is large enough
+        self.index_manager = IndexManager(
+            self.vector_db,
+            min_rows=INDEX_MIN_ROWS,
+            rebuild_after_rows=INDEX_REBUILD_AFTER_ROWS,
+            nprobes=INDEX_NPROBES
         )
+        # Fragment compaction after inserts and deletes; runs in the same background job as index builds
+        self.table_maintenance = TableMaintenance(
+            self.vector_db,
+            min_small_fragments=COMPACTION_MIN_SMALL_FRAGMENTS,
+            version_retention_seconds=LANCEDB_VERSION_RETENTION_SECONDS
+        )
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._compaction_forced = False
+        
+        # Retrieval ranking: local reciprocal-rank fusion of separate vector and keyword
+        # searches ("rrf"), or LanceDb's built-in hybrid search ("lancedb")
+        self.ranker = RETRIEVAL_RANKER
+        self.rrf_candidate_multiplier = RRF_CANDIDATE_MULTIPLIER
+        self.hybrid_ranker = HybridRanker(
+            k=RRF_K,
+            vector_weight=RRF_VECTOR_WEIGHT,
+            keyword_weight=RRF_KEYWORD_WEIGHT,
+            recency_boost=RECENCY_BOOST,
+            recency_half_life_days=RECENCY_HALF_LIFE_DAYS,
+            category_boost=CATEGORY_BOOST
+        )
+        
+        # Periodic compaction and version cleanup of all LanceDB tables
+        self.maintenance_interval = MAINTENANCE_INTERVAL_SECONDS
+        self._scheduler_task: Optional[asyncio.Task] = None
+        self.next_maintenance_at: Optional[float] = None
+        self.last_maintenance: Optional[Dict[str, Any]] = None
         
-        self.documents = {}  # Track ingested documents
-        self.agents = {}  # Cache agents per user
+        self.query_batch_concurrency = QUERY_BATCH_CONCURRENCY
+        self.inflight_queries = SingleFlight()
+        
+        # Process pool for CPU-bound ingestion work (PDF parsing, chunking), created on first use
+        self.ingest_process_workers = INGEST_PROCESS_WORKERS
+        self._ingest_executor: Optional[ProcessPoolExecutor] = None
+        self._ingest_slots = asyncio.Semaphore(INGEST_PROCESS_WORKERS)
+        self.pdf_pages_per_task = PDF_PAGES_PER_TASK
+        self.chunk_size = CHUNK_SIZE
+        self.chunk_overlap = CHUNK_OVERLAP
+        
+        # Chunks are embedded and written to LanceDB in batches; failed batches are retried
+        self.embed_batch_size = max(1, EMBED_BATCH_SIZE)
+        self.embed_batch_retries = EMBED_BATCH_RETRIES
+        self.embed_retry_backoff = EMBED_RETRY_BACKOFF_SECONDS
+        
+        # Packs retrieved chunks into the RAG prompt within a token budget
+        self.context_assembler = ContextAssembler(
+            token_budget=CONTEXT_TOKEN_BUDGET,
+            duplicate_threshold=CONTEXT_DUPLICATE_THRESHOLD
+        )
+        
+        # Documents and chunk text persist in SQLite; both are loaded on first use so
+        # startup does not scale with the number of documents
+        self.registry = DocumentRegistry(REGISTRY_PATH)
+        self._documents: Optional[Dict[str, Dict[str, Any]]] = None  # Track ingested documents
+        self.content_hashes: Dict[str, str] = {}  # SHA-256 of an uploaded PDF -> document_id
+        self.migration_drop_unowned_rows = MIGRATION_DROP_UNOWNED_ROWS
+        self._add_content_column()
+        self._add_document_columns()
+        
+        # Warm agents reused across requests instead of constructing one per query
+        self.agent_pool = AgentPool(
+            size=AGENT_POOL_SIZE,
+            model_id=LLM_MODEL_ID,
+            max_runs_per_agent=AGENT_POOL_MAX_RUNS,
+            timeout_seconds=LLM_TIMEOUT_SECONDS,
+            keepalive_seconds=LLM_KEEPALIVE_SECONDS
+        )
+        self.document_chunks = {}  # Chunk text per document, used by the fallback search
+        self.keyword_index = BM25Index()  # Inverted index over document_chunks
+        self._keyword_index_loaded = False
+        self._keyword_index_task: Optional[asyncio.Task] = None
+        self._keyword_index_lock = threading.Lock()
+        
+        # Answer cache; entries are keyed on the knowledge base version so that
+        # ingesting or removing a document invalidates previously generated answers
+        self.kb_version = int(self.registry.get_meta("kb_version", "0"))
+        self.answer_cache = AnswerCache(
+            max_entries=ANSWER_CACHE_MAX_ENTRIES,
+            ttl_seconds=ANSWER_CACHE_TTL_SECONDS
+        )
+        
+        # Second cache tier: paraphrased questions matched by embedding similarity
+        self.semantic_cache: Optional[SemanticAnswerCache] = None
+        if SEMANTIC_CACHE_ENABLED:
+            self.semantic_cache = SemanticAnswerCache(
+                uri="data/lancedb",
+                table_name=SEMANTIC_CACHE_TABLE,
+                embedder=self.embedder,
+                similarity_threshold=SEMANTIC_CACHE_THRESHOLD,
+                ttl_seconds=SEMANTIC_CACHE_TTL_SECONDS,
+                max_entries=SEMANTIC_CACHE_MAX_ENTRIES
+            )
+        # One-row inserts per cached answer and purges fragment this table too
+        self.semantic_cache_maintenance: Optional[TableMaintenance] = None
+        if self.semantic_cache:
+            self.semantic_cache_maintenance = TableMaintenance(
+                self.semantic_cache,
+                min_small_fragments=COMPACTION_MIN_SMALL_FRAGMENTS,
+                version_retention_seconds=LANCEDB_VERSION_RETENTION_SECONDS
+            )
         
         # Ensure data directory exists
         os.makedirs("data/lancedb", exist_ok=True)
     
+    async def warm_up(self):
+        """Pre-create pooled agents and open LLM connections before serving traffic"""
+        try:
+            await self.agent_pool.warm_up()
+        except Exception as e:
+            print(f"Warning: Could not warm up agent pool: {e}")
+    
+    async def shutdown(self):
+        """Stop the maintenance scheduler and release pooled agents, their HTTP connections and the ingestion process pool"""
+        await self.stop_maintenance_scheduler()
+        await self.agent_pool.close()
+        if self._ingest_executor is not None:
+            self._ingest_executor.shutdown(wait=False, cancel_futures=True)
+            self._ingest_executor = None
+        self.registry.close()
+        if self.embedding_cache:
+            self.embedding_cache.close()
+    
+    @property
+    def documents(self) -> Dict[str, Dict[str, Any]]:
+        """Tracked documents by id, loaded from the registry on first access"""
+        if self._documents is None:
+            documents = self.registry.load_documents()
+            for document_id, document_info in documents.items():
+                if document_info.get("content_hash"):
+                    self.content_hashes[document_info["content_hash"]] = document_id
+            self._documents = documents
+        return self._documents
+    
+    def _ensure_keyword_index(self):
+        """Build the keyword index from the stored chunks the first time it is needed"""
+        if self._keyword_index_loaded:
+            return
+        with self._keyword_index_lock:
+            if self._keyword_index_loaded:
+                return
+            for document_id, chunks in self.registry.iter_chunks():
+                if document_id not in self.document_chunks:
+                    self.document_chunks[document_id] = chunks
+                    self.keyword_index.add_document(document_id, chunks)
+            self._keyword_index_loaded = True
+    
+    def _forget_chunks(self, document_id: str):
+        """Drop a document from the keyword index"""
+        with self._keyword_index_lock:
+            self.document_chunks.pop(document_id, None)
+            self.keyword_index.remove_document(document_id)
+    
+    def start_keyword_index_build(self):
+        """Build the keyword index in a worker thread in the background, so a fallback search finds it ready"""
+        if self._keyword_index_task is None and not self._keyword_index_loaded:
+            self._keyword_index_task = asyncio.create_task(asyncio.to_thread(self._build_keyword_index))
+    
+    def _build_keyword_index(self):
+        try:
+            self._ensure_keyword_index()
+        except Exception as e:
+            print(f"Warning: Could not build keyword index: {e}")
+    
+    def _store_chunks(
+        self,
+        document_id: str,
+        chunks: List[str],
+        row_ids: List[str],
+        spans: List[Tuple[int, int]]
+    ):
+        """Persist a document's chunks and refresh the keyword index if it is loaded"""
+        self.registry.save_chunks(document_id, chunks, row_ids, spans)
+        with self._keyword_index_lock:
+            if self._keyword_index_loaded:
+                self.document_chunks[document_id] = chunks
+                self.keyword_index.remove_document(document_id)
+                self.keyword_index.add_document(document_id, chunks)
+    
     async def query(
         self, 
         query: str, 
         user_id: str = "default_user",
-        max_results: int = 5
+        max_results: int = 5,
+        filters: Optional[SearchFilters] = None
     ) -> Dict[str, Any]:
-        """Query the knowledge base using RAG (Retrieval-Augmented Generation)"""
+        """Query the knowledge base using RAG (Retrieval-Augmented Generation).
+        
+        filters restricts retrieval to matching documents (category, document ids,
+        upload date range).
+        """
+        
+        # Identical queries arriving while one is being answered share its result
+        flight_key = self.answer_cache.make_key(query, max_results, self.kb_version, filters)
+        result, shared = await self.inflight_queries.do(
+            flight_key,
+            lambda: self._answer_query(query, user_id, max_results, filters)
+        )
+        if shared:
+            return {**result, "query": query, "user_id": user_id, "coalesced": True}
+        return result
+    
+    async def _answer_query(
+        self,
+        query: str,
+        user_id: str,
+        max_results: int,
+        filters: Optional[SearchFilters] = None
+    ) -> Dict[str, Any]:
+        """Answer a query from the caches or with a fresh retrieval and LLM call"""
         
         try:
             # First, check if we have any documents
             if not self.documents:
-                return {
-                    "query": query,
-                    "response": "No documents have been ingested yet. Please upload some PDF documents first.",
-                    "user_id": user_id,
-                    "sources": [],
-                    "timestamp": None,
-                    "rag_used": False
-                }
+                return self._no_answer_response(
+                    query, user_id,
+                    "No documents have been ingested yet. Please upload some PDF documents first."
+                )
             
-            # Try vector database search first
-            relevant_docs = []
-            try:
-                relevant_docs = await self.vector_db.async_search(query, limit=max_results)
-            except Exception as e:
-                print(f"Vector search failed: {e}")
-                # Fallback to semantic search using stored chunks
-                relevant_docs = self.semantic_search_fallback(query, max_results)
+            # Serve repeated questions from the answer caches
+            kb_version = self.kb_version
+            cache_key, query_embedding, cached = await self._lookup_cached_answer(
+                query, user_id, max_results, kb_version, filters
+            )
+            if cached is not None:
+                return cached
             
+            relevant_docs, _ = await self._retrieve(query, max_results, filters)
             if not relevant_docs:
-                return {
-                    "query": query,
-                    "response": "No relevant documents found in the knowledge base for your query.",
-                    "user_id": user_id,
-                    "sources": [],
-                    "timestamp": None,
-                    "rag_used": False
-                }
-            
-            # Extract document content and metadata
-            sources = []
-            context_parts = []
-            
-            for doc in relevant_docs:
-                # Extract document info
-                doc_id = getattr(doc, 'id', str(uuid.uuid4()))
-                doc_name = getattr(doc, 'name', 'Unknown Document')
-                doc_content = getattr(doc, 'content', str(doc))
-                
-                sources.append({
-                    "id": doc_id,
-                    "name": doc_name,
-                    "content": doc_content[:200] + "..." if len(doc_content) > 200 else doc_content
-                })
-                
-                context_parts.append(f"Document: {doc_name}\nContent: {doc_content}")
-            
-            # Combine all relevant context
-            full_context = "\n\n".join(context_parts)
-            
-            # Create a prompt that uses the retrieved context
-            rag_prompt = f"""Based on the following documents from the customer support knowledge base, please answer the user's question. 
-            If the information is not available in the provided documents, say so clearly.
-
-            Documents:
-            {full_context}
-
-            User Question: {query}
-
-            Please provide a comprehensive answer based only on the information in the documents above."""
+                return self._no_answer_response(
+                    query, user_id,
+                    "No relevant documents found in the knowledge base for your query."
+                )
             
-            # Get response from agent using the RAG-enhanced prompt
-            agent = Agent(
-                user_id=user_id,
-                search_knowledge=False,  # We're doing manual retrieval
-                show_tool_calls=False,
-            )
+            sources, rag_prompt, context_tokens = self._build_rag_prompt(query, relevant_docs)
             
-            response = await agent.arun(rag_prompt)
+            # Get response from a pooled agent using the RAG-enhanced prompt
+            async with self.agent_pool.acquire(user_id) as agent:
+                response = await agent.arun(rag_prompt, stream=False)
             
-            return {
+            result = {
                 "query": query,
                 "response": response.content if hasattr(response, 'content') else str(response),
                 "user_id": user_id,
                 "sources": sources,
-                "timestamp": response.timestamp.isoformat() if hasattr(response, 'timestamp') else None,
+                "timestamp": self._response_timestamp(response),
                 "rag_used": True,
-                "documents_retrieved": len(sources)
+                "documents_retrieved": len(sources),
+                "context_tokens": context_tokens,
+                "cached": False
             }
+            await self._store_answer(cache_key, query, query_embedding, max_results, kb_version, result)
+            
+            return result
             
         except Exception as e:
             raise Exception(f"Query failed: {str(e)}")
     
+    async def query_stream(
+        self,
+        query: str,
+        user_id: str = "default_user",
+        max_results: int = 5,
+        filters: Optional[SearchFilters] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Streaming variant of query.
+        
+        Yields ``(event, data)`` pairs: a ``sources`` event as soon as retrieval
+        finishes, one ``token`` event per generated chunk, and a final ``done``
+        event carrying the same payload as query().
+        """
+        if not self.documents:
+            result = self._no_answer_response(
+                query, user_id,
+                "No documents have been ingested yet. Please upload some PDF documents first."
+            )
+            yield "sources", {"sources": []}
+            yield "done", result
+            return
+        
+        kb_version = self.kb_version
+        cache_key, query_embedding, cached = await self._lookup_cached_answer(
+            query, user_id, max_results, kb_version, filters
+        )
+        if cached is not None:
+            yield "sources", {"sources": cached["sources"]}
+            yield "token", {"content": cached["response"]}
+            yield "done", cached
+            return
+        
+        relevant_docs, _ = await self._retrieve(query, max_results, filters)
+        if not relevant_docs:
+            result = self._no_answer_response(
+                query, user_id,
+                "No relevant documents found in the knowledge base for your query."
+            )
+            yield "sources", {"sources": []}
+            yield "done", result
+            return
+        
+        sources, rag_prompt, context_tokens = self._build_rag_prompt(query, relevant_docs)
+        yield "sources", {"sources": sources}
+        
+        content_parts = []
+        chunk = None
+        async with self.agent_pool.acquire(user_id) as agent:
+            response_stream = await agent.arun(rag_prompt, stream=True)
+            async for chunk in response_stream:
+                content = getattr(chunk, 'content', None)
+                if getattr(chunk, 'event', None) == RunEvent.run_response_content.value and isinstance(content, str) and content:
+                    content_parts.append(content)
+                    yield "token", {"content": content}
+            # The agent keeps the run's final response, as arun returns it without streaming
+            final_response = getattr(agent, 'run_response', None) or chunk
+        
+        result = {
+            "query": query,
+            "response": "".join(content_parts),
+            "user_id": user_id,
+            "sources": sources,
+            "timestamp": self._response_timestamp(final_response),
+            "rag_used": True,
+            "documents_retrieved": len(sources),
+            "context_tokens": context_tokens,
+            "cached": False
+        }
+        await self._store_answer(cache_key, query, query_embedding, max_results, kb_version, result)
+        yield "done", result
+    
+    async def search(
+        self,
+        query: str,
+        max_results: int = 5,
+        filters: Optional[SearchFilters] = None
+    ) -> Dict[str, Any]:
+        """Retrieve ranked chunks for a query without generating an answer"""
+        started = time.perf_counter()
+        
+        if not self.documents:
+            relevant_docs, retrieval = [], "none"
+        else:
+            relevant_docs, retrieval = await self._retrieve(query, max_results, filters)
+        
+        results = []
+        for rank, doc in enumerate(relevant_docs, start=1):
+            results.append({
+                "rank": rank,
+                "id": self._chunk_id(doc),
+                "name": doc.name,
+                "content": doc.content,
+                "score": round(doc.reranking_score, 6) if doc.reranking_score is not None else None,
+                "meta_data": doc.meta_data
+            })
+        
+        return {
+            "query": query,
+            "results": results,
+            "retrieval": retrieval,
+            "filters": filters.to_dict() if filters else None,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    
+    async def query_batch(
+        self,
+        queries: List[str],
+        user_id: str = "default_user",
+        max_results: int = 5,
+        filters: Optional[SearchFilters] = None
+    ) -> List[Dict[str, Any]]:
+        """Answer many queries at once.
+        
+        Identical queries (after normalization) are answered once, all query
+        embeddings are fetched in a single batched request, and the unique
+        queries run concurrently under a semaphore. Results are returned in
+        input order with a per-item status.
+        """
+        unique_queries: Dict[str, str] = {}
+        for query in queries:
+            unique_queries.setdefault(normalize_query(query), query)
+        texts = list(unique_queries.values())
+        
+        try:
+            await asyncio.to_thread(self.embedder.prefetch, texts)
+        except Exception as e:
+            # Queries will embed themselves one at a time
+            print(f"Warning: Batched query embedding failed: {e}")
+        
+        semaphore = asyncio.Semaphore(self.query_batch_concurrency)
+        
+        async def run(query: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    result = await self.query(query=query, user_id=user_id, max_results=max_results, filters=filters)
+                    return {"status": "success", "result": result}
+                except Exception as e:
+                    return {"status": "error", "error": str(e)}
+        
+        outcomes = await asyncio.gather(*(run(query) for query in texts))
+        
+        by_key = dict(zip(unique_queries.keys(), outcomes))
+        results = []
+        for index, query in enumerate(queries):
+            outcome = by_key[normalize_query(query)]
+            item = {"index": index, "query": query, "status": outcome["status"]}
+            if outcome["status"] == "success":
+                item["result"] = {**outcome["result"], "query": query}
+            else:
+                item["error"] = outcome["error"]
+            results.append(item)
+        return results
+    
+    @staticmethod
+    def _response_timestamp(response: Any) -> Optional[str]:
+        """ISO timestamp of an agent run response; agno records it as created_at in epoch seconds"""
+        timestamp = getattr(response, 'timestamp', None) or getattr(response, 'created_at', None)
+        if isinstance(timestamp, (int, float)):
+            timestamp = datetime.utcfromtimestamp(timestamp)
+        return timestamp.isoformat() if timestamp else None
+    
+    def _no_answer_response(self, query: str, user_id: str, message: str) -> Dict[str, Any]:
+        """Build the response returned when RAG could not be used"""
+        return {
+            "query": query,
+            "response": message,
+            "user_id": user_id,
+            "sources": [],
+            "timestamp": None,
+            "rag_used": False
+        }
+    
+    async def _lookup_cached_answer(
+        self,
+        query: str,
+        user_id: str,
+        max_results: int,
+        kb_version: int,
+        filters: Optional[SearchFilters] = None
+    ) -> Tuple[Any, Optional[List[float]], Optional[Dict[str, Any]]]:
+        """Check the exact and semantic answer caches.
+        
+        Returns the exact cache key, the query embedding computed for the
+        semantic lookup (if any) and the cached response (if any). Filtered
+        queries only use the exact cache, whose key includes the filters.
+        """
+        cache_key = self.answer_cache.make_key(query, max_results, kb_version, filters)
+        cached = self.answer_cache.get(cache_key)
+        if cached is not None:
+            return cache_key, None, {**cached, "user_id": user_id, "cached": True, "cache_type": "exact"}
+        
+        # Then look for a previously answered question with the same meaning
+        query_embedding = None
+        if self.semantic_cache and filters is None:
+            try:
+                query_embedding = await self.semantic_cache.embed(query)
+                match = await self.semantic_cache.lookup(query_embedding, max_results, kb_version)
+                if match is not None:
+                    result = {**match["answer"], "query": query}
+                    self.answer_cache.set(cache_key, result)
+                    return cache_key, query_embedding, {
+                        **result,
+                        "user_id": user_id,
+                        "cached": True,
+                        "cache_type": "semantic",
+                        "matched_query": match["matched_query"],
+                        "similarity": match["similarity"]
+                    }
+            except Exception as e:
+                print(f"Warning: Semantic cache lookup failed: {e}")
+        
+        return cache_key, query_embedding, None
+    
+    async def _store_answer(
+        self,
+        cache_key: Any,
+        query: str,
+        query_embedding: Optional[List[float]],
+        max_results: int,
+        kb_version: int,
+        result: Dict[str, Any]
+    ):
+        """Store a generated answer in the exact and semantic answer caches"""
+        self.answer_cache.set(cache_key, result)
+        if self.semantic_cache and query_embedding is not None:
+            try:
+                await self.semantic_cache.store(query, query_embedding, max_results, kb_version, result)
+            except Exception as e:
+                print(f"Warning: Could not store answer in semantic cache: {e}")
+    
+    async def _retrieve(
+        self,
+        query: str,
+        max_results: int,
+        filters: Optional[SearchFilters] = None
+    ) -> Tuple[List[Document], str]:
+        """Retrieve the chunks most relevant to a query.
+        
+        Returns the scored chunks and the retrieval method that produced them.
+        """
+        # Filters become a prefilter on the table's document columns, so only the
+        # matching documents' rows are searched
+        where = filters.where_clause() if filters is not None else None
+        
+        # Try vector database search first; LanceDb searches synchronously, so run it
+        # in a worker thread to keep the event loop (and concurrent queries) moving
+        try:
+            if self.ranker == "rrf":
+                relevant_docs = await asyncio.to_thread(self._search_rrf, query, max_results, where)
+                return relevant_docs, self._retrieval_method()
+            relevant_docs = await asyncio.to_thread(self._search_vector_db, query, max_results, where)
+        except Exception as e:
+            print(f"Vector search failed: {e}")
+            # Fallback to semantic search using stored chunks
+            document_ids = None
+            if filters is not None:
+                document_ids = {
+                    document_id for document_id, document_info in self.documents.items()
+                    if filters.matches(document_info)
+                }
+            # Scoring (and building the index, if the startup build has not finished) is CPU-bound
+            relevant_docs = await asyncio.to_thread(self.semantic_search_fallback, query, max_results, document_ids)
+            return relevant_docs, "keyword_fallback"
+        
+        # LanceDb drops its scores, so score each chunk by cosine similarity to the
+        # query (the query embedding is already in the embedding cache)
+        query_embedding = self.embedder.get_embedding(query)
+        for doc in relevant_docs:
+            if doc.reranking_score is None and doc.embedding is not None:
+                doc.reranking_score = cosine_similarity(query_embedding, doc.embedding)
+        return relevant_docs, self._retrieval_method()
+    
+    def _retrieval_method(self) -> str:
+        return "rrf" if self.ranker == "rrf" else self.vector_db.search_type.value
+    
+    def _search_rrf(self, query: str, limit: int, where: Optional[str] = None) -> List[Document]:
+        """Run vector and full-text searches separately and fuse them with the hybrid ranker.
+        
+        Each source returns limit * rrf_candidate_multiplier candidates. The per-source
+        ranks and scores of each returned chunk are put in its meta_data under "scores".
+        Identical content stored for several documents is returned once, as the
+        document whose row ranked best. Called from worker threads.
+        """
+        table = self.vector_db.table
+        candidates = limit * self.rrf_candidate_multiplier
+        query_embedding = self.embedder.get_embedding(query)
+        
+        # Cosine distance, so each row's vector score is 1 - _distance
+        vector_search = table.search(query_embedding, vector_column_name="vector").distance_type(self.index_manager.metric)
+        if self.vector_db.nprobes:
+            vector_search = vector_search.nprobes(self.vector_db.nprobes)
+        if where is not None:
+            vector_search = vector_search.where(where, prefilter=True)
+        vector_rows = vector_search.limit(candidates).to_list()
+        
+        # A broken full-text index degrades ranking to vector-only instead of failing the query
+        keyword_rows = []
+        try:
+            self.index_manager.ensure_fts_index()
+            keyword_search = table.search(query, query_type="fts", fts_columns=CONTENT_COLUMN.name)
+            if where is not None:
+                keyword_search = keyword_search.where(where, prefilter=True)
+            keyword_rows = keyword_search.limit(candidates).to_list()
+        except Exception as e:
+            print(f"Warning: Full-text search failed, ranking by vector search only: {e}")
+        
+        # Documents containing the same chunk each have their own row; the rows share
+        # the content hash as id, so fusing by id collapses them into one hit
+        def row_key(row: Dict[str, Any]) -> str:
+            return row["id"]
+        
+        rows = {}
+        for row in vector_rows + keyword_rows:
+            rows.setdefault(row_key(row), row)
+        documents = {key: self._row_to_document(row) for key, row in rows.items()}
+        
+        vector_hits = [(row_key(row), 1 - row["_distance"]) for row in vector_rows]
+        keyword_hits = [(row_key(row), row.get("_score")) for row in keyword_rows]
+        document_infos = {key: self.documents.get(row["document_id"]) for key, row in rows.items()}
+        
+        ranked_docs = []
+        for key, score, scores in self.hybrid_ranker.fuse(query, vector_hits, keyword_hits, document_infos, limit):
+            doc = documents[key]
+            doc.reranking_score = score
+            doc.meta_data = {**doc.meta_data, "scores": scores}
+            ranked_docs.append(doc)
+        return self._apply_chunk_positions(ranked_docs)
+    
+    @staticmethod
+    def _chunk_id(doc: Document) -> str:
+        """Stable id of a retrieved chunk (LanceDb does not return the id it was inserted with)"""
+        if getattr(doc, 'id', None):
+            return doc.id
+        meta_data = getattr(doc, 'meta_data', None) or {}
+        if "document_id" in meta_data and "chunk_id" in meta_data:
+            return f"{meta_data['document_id']}_chunk_{meta_data['chunk_id']}"
+        return str(uuid.uuid4())
+    
+    def _search_vector_db(self, query: str, limit: int, where: Optional[str] = None) -> List[Document]:
+        """Run a LanceDb-style search, restricted to the rows matching where; called from worker threads.
+        
+        The query is built on the table rather than through LanceDb.search, which can
+        neither filter nor search the content column (it indexes the JSON payload).
+        """
+        # Concurrent first keyword/hybrid searches would otherwise race on creating the index
+        if self.vector_db.search_type != SearchType.vector:
+            self.index_manager.ensure_fts_index()
+        
+        table = self.vector_db.table
+        search_type = self.vector_db.search_type
+        if search_type == SearchType.keyword:
+            results = table.search(query, query_type="fts", fts_columns=CONTENT_COLUMN.name)
+        else:
+            query_embedding = self.embedder.get_embedding(query)
+            if search_type == SearchType.hybrid:
+                results = (
+                    table.search(vector_column_name="vector", query_type="hybrid", fts_columns=CONTENT_COLUMN.name)
+                    .vector(query_embedding).text(query)
+                )
+            else:
+                results = table.search(query_embedding, vector_column_name="vector")
+            if self.vector_db.nprobes:
+                results = results.nprobes(self.vector_db.nprobes)
+        
+        if where is not None:
+            results = results.where(where, prefilter=True)
+        rows = results.limit(limit).to_list()
+        docs = self._collapse_identical_chunks([self._row_to_document(row) for row in rows])
+        return self._apply_chunk_positions(docs)
+    
+    def _collapse_identical_chunks(self, docs: List[Document]) -> List[Document]:
+        """Keep the best ranked of the rows different documents hold for the same content"""
+        seen = set()
+        unique = []
+        for doc in docs:
+            row_id = self.chunk_row_id(doc.content)
+            if row_id not in seen:
+                seen.add(row_id)
+                unique.append(doc)
+        return unique
+    
+    def _apply_chunk_positions(self, docs: List[Document]) -> List[Document]:
+        """Set each retrieved chunk's position, offsets and name from the document registry.
+        
+        Unchanged rows are kept when a document is updated, so the current position
+        of a chunk is only known to the registry. Called from worker threads.
+        """
+        keys = {}
+        for doc in docs:
+            document_id = (doc.meta_data or {}).get("document_id")
+            if document_id:
+                keys[id(doc)] = (document_id, self.chunk_row_id(doc.content))
+        positions = self.registry.chunk_positions(keys.values())
+        for doc in docs:
+            position = positions.get(keys.get(id(doc)))
+            if position is None:
+                continue
+            chunk_id, start_offset, end_offset = position
+            doc.name = f"Customer Support Guide - Chunk {chunk_id + 1}"
+            doc.meta_data = {
+                **doc.meta_data,
+                "chunk_id": chunk_id,
+                "start_offset": start_offset,
+                "end_offset": end_offset
+            }
+        return docs
+    
+    def _row_to_document(self, row: Dict[str, Any]) -> Document:
+        """Build a Document from a LanceDB row, as LanceDb does for its search results"""
+        payload = json.loads(row["payload"])
+        return Document(
+            name=payload["name"],
+            meta_data=payload["meta_data"],
+            content=payload["content"],
+            embedder=self.embedder,
+            embedding=list(row["vector"]),
+            usage=payload.get("usage")
+        )
+    
+    def _build_rag_prompt(self, query: str, relevant_docs: List[Document]) -> Tuple[List[Dict[str, Any]], str, int]:
+        """Build the source list and the RAG prompt from retrieved chunks.
+        
+        Returns the sources actually placed in the prompt, the prompt, and the
+        estimated number of context tokens it uses.
+        """
+        context_chunks, context_tokens = self.context_assembler.assemble([
+            (doc, getattr(doc, 'content', str(doc)), doc.reranking_score or 0.0)
+            for doc in relevant_docs
+        ])
+        
+        # Extract document content and metadata
+        sources = []
+        context_parts = []
+        
+        for chunk in context_chunks:
+            # Extract document info
+            doc = chunk.item
+            doc_id = self._chunk_id(doc)
+            doc_name = getattr(doc, 'name', None) or 'Unknown Document'
+            doc_content = chunk.content
+            
+            source = {
+                "id": doc_id,
+                "name": doc_name,
+                "content": doc_content[:200] + "..." if len(doc_content) > 200 else doc_content,
+                "score": round(chunk.score, 6)
+            }
+            # Per-source ranks and scores from the hybrid ranker
+            scores = (getattr(doc, 'meta_data', None) or {}).get("scores")
+            if scores:
+                source["scores"] = scores
+            sources.append(source)
+            
+            context_parts.append(f"Document: {doc_name}\nContent: {doc_content}")
+        
+        # Combine all relevant context
+        full_context = "\n\n".join(context_parts)
+        
+        # Create a prompt that uses the retrieved context
+        rag_prompt = f"""Based on the following documents from the customer support knowledge base, please answer the user's question. 
+        If the information is not available in the provided documents, say so clearly.
+
+        Documents:
+        {full_context}
+
+        User Question: {query}
+
+        Please provide a comprehensive answer based only on the information in the documents above."""
+        
+        return sources, rag_prompt, context_tokens
+    
     async def list_documents(self) -> List[Dict[str, Any]]:
         """List all ingested documents"""
         return list(self.documents.values())
     
     def add_document(self, document_id: str, document_info: Dict[str, Any]):
         """Add document to tracking"""
+        previous = self.documents.get(document_id)
+        if previous and self.content_hashes.get(previous.get("content_hash")) == document_id:
+            del self.content_hashes[previous["content_hash"]]
         self.documents[document_id] = document_info
+        if document_info.get("content_hash"):
+            self.content_hashes[document_info["content_hash"]] = document_id
+        self.registry.save_document(document_id, document_info)
+    
+    def find_document_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Get the ingested document with identical file content, if any"""
+        document_info = self.documents.get(self.content_hashes.get(content_hash))
+        if document_info and document_info.get("status") == "ingested":
+            return document_info
+        return None
     
     def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
         """Get document info by ID"""
         return self.documents.get(document_id)
     
-    def read_pdf_content(self, file_path: str) -> str:
+    async def remove_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a document's chunks from the vector database, drop it from tracking and invalidate cached answers.
+        
+        The deleted rows are compacted away by a background job. Also used to
+        discard a document whose ingestion failed.
+        """
+        # Delete from LanceDB first: if that fails the document is still tracked
+        removed_rows = await asyncio.to_thread(self._delete_document_rows, document_id)
+        
+        document_info = self.documents.pop(document_id, None)
+        if document_info and self.content_hashes.get(document_info.get("content_hash")) == document_id:
+            del self.content_hashes[document_info["content_hash"]]
+        await asyncio.to_thread(self.registry.delete_document, document_id)
+        # The keyword index lock is held while the index is being built
+        await asyncio.to_thread(self._forget_chunks, document_id)
+        await self.bump_kb_version()
+        
+        print(f"DEBUG: Removed {removed_rows} chunks of document {document_id} from the vector database")
+        self._schedule_table_maintenance(force_compaction=bool(removed_rows))
+        return document_info
+    
+    async def bump_kb_version(self):
+        """Mark the knowledge base as changed so cached answers are no longer served"""
+        self.kb_version += 1
+        self.registry.set_meta("kb_version", str(self.kb_version))
+        self.answer_cache.clear()
+        if self.semantic_cache:
+            try:
+                # Deleting from the LanceDB cache table is blocking I/O
+                await asyncio.to_thread(self.semantic_cache.purge, self.kb_version)
+            except Exception as e:
+                print(f"Warning: Could not purge semantic cache: {e}")
+    
+    def _schedule_table_maintenance(self, force_compaction: bool = False):
+        """Check in the background whether the LanceDB indexes need (re)building and the table compacting.
+        
+        force_compaction compacts regardless of the fragment threshold, e.g. after deletes.
+        """
+        if force_compaction:
+            self._compaction_forced = True
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(asyncio.to_thread(self._run_table_maintenance))
+    
+    def _run_table_maintenance(self):
+        """Index build and compaction, one after the other so they never rewrite the table concurrently"""
+        while True:
+            force_compaction, self._compaction_forced = self._compaction_forced, False
+            self.index_manager.ensure_scalar_indexes()
+            self.index_manager.maybe_build()
+            self.table_maintenance.maybe_compact(force_compaction)
+            # Deletes made while this ran asked for another compaction
+            if not self._compaction_forced:
+                return
+    
+    async def start_maintenance_scheduler(self):
+        """Start compacting and pruning the LanceDB tables every maintenance_interval seconds (0 disables)"""
+        if self.maintenance_interval > 0 and self._scheduler_task is None:
+            self._scheduler_task = asyncio.create_task(self._maintenance_loop(), name="lancedb-maintenance")
+    
+    async def stop_maintenance_scheduler(self):
+        if self._scheduler_task is not None:
+            self._scheduler_task.cancel()
+            await asyncio.gather(self._scheduler_task, return_exceptions=True)
+            self._scheduler_task = None
+            self.next_maintenance_at = None
+    
+    async def _maintenance_loop(self):
+        while True:
+            self.next_maintenance_at = time.time() + self.maintenance_interval
+            await asyncio.sleep(self.maintenance_interval)
+            try:
+                report = await self.run_maintenance()
+                removed = sum(table["last_run"]["bytes_removed"] or 0 for table in report.values() if table["last_run"])
+                print(f"DEBUG: LanceDB maintenance finished, {removed} bytes of old versions removed")
+            except Exception as e:
+                print(f"Warning: LanceDB maintenance failed: {e}")
+    
+    async def run_maintenance(self) -> Dict[str, Any]:
+        """Compact every LanceDB table and prune versions past the retention window now.
+        
+        Expired semantic cache entries and those beyond its size limit are deleted
+        first. Returns the state of each table, including the files and bytes
+        removed by this run.
+        """
+        # The knowledge base table goes through the background job so it never runs next to an index build
+        self._schedule_table_maintenance(force_compaction=True)
+        await self._maintenance_task
+        if self.semantic_cache_maintenance:
+            try:
+                purged = await asyncio.to_thread(self.semantic_cache.purge, self.kb_version)
+                print(f"DEBUG: Purged {purged} semantic cache entries")
+            except Exception as e:
+                print(f"Warning: Could not purge semantic cache: {e}")
+            await asyncio.to_thread(self.semantic_cache_maintenance.maybe_compact, True)
+        
+        self.last_maintenance = {"finished_at": datetime.utcnow().isoformat()}
+        return (await self.get_compaction_state())["tables"]
+    
+    async def get_compaction_state(self) -> Dict[str, Any]:
+        """Return fragment, version and file counts of each LanceDB table and the scheduler state"""
+        tables = {"knowledge_base": await asyncio.to_thread(self.table_maintenance.state)}
+        if self.semantic_cache_maintenance:
+            tables["semantic_cache"] = await asyncio.to_thread(self.semantic_cache_maintenance.state)
+        return {
+            "tables": tables,
+            "scheduler": {
+                "interval_seconds": self.maintenance_interval,
+                "running": self._scheduler_task is not None,
+                "next_run_at": (
+                    datetime.utcfromtimestamp(self.next_maintenance_at).isoformat()
+                    if self.next_maintenance_at else None
+                ),
+                "last_run": self.last_maintenance
+            }
+        }
+    
+    async def get_index_state(self, probe_queries: int = 0) -> Dict[str, Any]:
+        """Return LanceDB index state, optionally with a recall/latency probe"""
+        state = await asyncio.to_thread(self.index_manager.state)
+        if probe_queries > 0:
+            state["probe"] = await asyncio.to_thread(self.index_manager.probe, probe_queries)
+        return state
+    
+    async def rebuild_indexes(self) -> Dict[str, Any]:
+        """Rebuild the vector and full-text indexes now, regardless of thresholds"""
+        built = await asyncio.to_thread(self.index_manager.maybe_build, True)
+        state = await asyncio.to_thread(self.index_manager.state)
+        state["rebuilt"] = built
+        return state
+    
+    async def get_cache_stats(self) -> Dict[str, Any]:
+        """Return answer cache statistics"""
+        # Both persistent caches count their entries with a blocking query
+        semantic_cache = await asyncio.to_thread(self.semantic_cache.stats) if self.semantic_cache else None
+        embedding_cache = await asyncio.to_thread(self.embedding_cache.stats) if self.embedding_cache else None
+        return {
+            "kb_version": self.kb_version,
+            "answer_cache": self.answer_cache.stats(),
+            "semantic_cache": semantic_cache,
+            "query_embedding_cache": self.embedder.stats(),
+            "embedding_cache": embedding_cache,
+            "inflight_queries": self.inflight_queries.stats(),
+            "agent_pool": self.agent_pool.stats()
+        }
+    
+    def read_pdf_content(self, file_path: str, progress_callback: Optional[Callable[..., None]] = None) -> str:
         """Read PDF content using PyPDF2"""
+        content, pages = extract_pdf_text(file_path)
+        if progress_callback:
+            progress_callback(pages_total=pages, pages_parsed=pages)
+        return content
+    
+    async def _run_in_ingest_pool(self, fn: Callable, *args):
+        """Run a CPU-bound ingestion step in the ingestion process pool.
+        
+        Parsing and chunking never run on the event loop, and at most
+        INGEST_PROCESS_WORKERS of them run at once, so ingestion does not
+        stall concurrent queries.
+        """
+        if self._ingest_executor is None:
+            self._ingest_executor = ProcessPoolExecutor(
+                max_workers=self.ingest_process_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        async with self._ingest_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._ingest_executor, fn, *args)
+    
+    async def extract_pdf_text_parallel(
+        self,
+        file_path: str,
+        progress_callback: Optional[Callable[..., None]] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Extract PDF text with the page range split across the ingestion process pool.
+        
+        Returns the document text and extraction stats (pages, seconds, pages/sec).
+        """
+        started = time.perf_counter()
+        page_count = await self._run_in_ingest_pool(count_pdf_pages, file_path)
+        
+        # Small documents are not worth the per-task cost of re-opening the PDF
+        parts = min(self.ingest_process_workers, -(-page_count // self.pdf_pages_per_task))
+        ranges = split_page_ranges(page_count, parts)
+        pages_parsed = 0
+        
+        async def extract(start: int, end: int) -> List[str]:
+            nonlocal pages_parsed
+            page_texts = await self._run_in_ingest_pool(extract_pdf_pages, file_path, start, end)
+            pages_parsed += len(page_texts)
+            if progress_callback:
+                progress_callback(pages_total=page_count, pages_parsed=pages_parsed)
+            return page_texts
+        
+        page_groups = await asyncio.gather(*(extract(start, end) for start, end in ranges))
+        content = join_pages([text for group in page_groups for text in group])
+        
+        seconds = time.perf_counter() - started
+        return content, {
+            "pages": page_count,
+            "extraction_tasks": len(ranges),
+            "extraction_seconds": round(seconds, 3),
+            "pages_per_second": round(page_count / seconds, 2) if seconds > 0 else None
+        }
+    
+    async def add_document_to_knowledge_base(
+        self,
+        document_id: str,
+        file_path: str,
+        progress_callback: Optional[Callable[..., None]] = None
+    ):
+        """Add a new document to the knowledge base.
+        
+        progress_callback, if given, is called with keyword updates (pages_parsed,
+        chunks_total, chunks_embedded, error) as ingestion proceeds. Returns
+        ingestion stats.
+        """
+        def report(**updates):
+            if progress_callback:
+                progress_callback(**updates)
+        
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                content = ""
-                for page in pdf_reader.pages:
-                    content += page.extract_text() + "\n"
-                return content
+            # Read the PDF content
+            pdf_content, stats = await self.extract_pdf_text_parallel(file_path, progress_callback)
+            
+            # Split content into chunks; the worker returns offsets, the text is sliced here
+            spans = await self._run_in_ingest_pool(chunk_text_spans, pdf_content, self.chunk_size, self.chunk_overlap)
+            chunks = [pdf_content[start:end] for start, end in spans]
+            stats["chunks"] = len(chunks)
+            report(chunks_total=len(chunks))
+            
+            # Store chunk text for the keyword index and the row ids for later updates
+            row_ids = [self.chunk_row_id(chunk) for chunk in chunks]
+            await asyncio.to_thread(self._store_chunks, document_id, chunks, row_ids, spans)
+            
+            # Add the chunks to the vector database, one embedding request and one write per batch
+            embed_started = time.perf_counter()
+            counts = await self._embed_chunks(
+                document_id, file_path, chunks, range(len(chunks)), report, self._document_columns(document_id)
+            )
+            
+            embed_seconds = time.perf_counter() - embed_started
+            stats["embed_batches"] = -(-len(chunks) // self.embed_batch_size)
+            stats.update(counts)
+            stats["chunks_reused"] = len(chunks) - counts["rows_added"]  # Already stored for this document (resumed ingestion) or repeated
+            stats["embedding_seconds"] = round(embed_seconds, 3)
+            stats["chunks_per_second"] = round(len(chunks) / embed_seconds, 2) if embed_seconds > 0 else None
+            
+            # New content is searchable, so previously cached answers may be stale
+            await self.bump_kb_version()
+            self._schedule_table_maintenance()
+            return stats
+            
         except Exception as e:
-            raise Exception(f"Failed to read PDF: {str(e)}")
+            raise Exception(f"Failed to add document to knowledge base: {str(e)}")
     
-    async def add_document_to_knowledge_base(self, document_id: str, file_path: str):
-        """Add a new document to the knowledge base"""
+    async def update_document_in_knowledge_base(
+        self,
+        document_id: str,
+        file_path: str,
+        progress_callback: Optional[Callable[..., None]] = None,
+        source_file: Optional[str] = None,
+        category: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Replace a document with a new version, embedding only the chunks that changed.
+        
+        The new version is chunked and its chunk hashes are diffed against the rows
+        stored for the document: new chunks are inserted, chunks that disappeared
+        are deleted, and unchanged rows are kept as they are. source_file is
+        recorded in chunk metadata when file_path is a staging copy; category, if
+        given, replaces the document's category on all its rows. Returns ingestion
+        stats.
+        """
+        def report(**updates):
+            if progress_callback:
+                progress_callback(**updates)
+        
         try:
-            # Read the PDF content
-            pdf_content = self.read_pdf_content(file_path)
+            pdf_content, stats = await self.extract_pdf_text_parallel(file_path, progress_callback)
+            spans = await self._run_in_ingest_pool(chunk_text_spans, pdf_content, self.chunk_size, self.chunk_overlap)
+            chunks = [pdf_content[start:end] for start, end in spans]
+            stats["chunks"] = len(chunks)
+            report(chunks_total=len(chunks))
+            
+            old_row_ids = set(await asyncio.to_thread(self.registry.get_row_ids, document_id))
+            new_row_ids = [self.chunk_row_id(chunk) for chunk in chunks]
+            changed = [i for i, row_id in enumerate(new_row_ids) if row_id not in old_row_ids]
+            
+            columns = self._document_columns(document_id)
+            if category is not None:
+                columns["category"] = category
+            
+            # Insert before deleting so the document never disappears from search
+            embed_started = time.perf_counter()
+            try:
+                counts = await self._embed_chunks(
+                    document_id, source_file or file_path, chunks, changed, report, columns
+                )
+            except Exception:
+                # Keep the current version as it was: drop the rows of the new chunks
+                await asyncio.to_thread(self._delete_rows, document_id, {new_row_ids[i] for i in changed})
+                raise
+            stats["embedding_seconds"] = round(time.perf_counter() - embed_started, 3)
             
-            # Split content into chunks (simple approach)
-            chunks = self.chunk_content(pdf_content, chunk_size=1000)
+            stale_row_ids = old_row_ids - set(new_row_ids)
+            await asyncio.to_thread(self._delete_rows, document_id, stale_row_ids)
+            if columns["category"] != self.documents[document_id].get("category"):
+                await asyncio.to_thread(self._set_document_category, document_id, columns["category"])
+            await asyncio.to_thread(self._store_chunks, document_id, chunks, new_row_ids, spans)
             
-            # Store chunks in memory for now (we'll implement proper vector search)
-            if not hasattr(self, 'document_chunks'):
-                self.document_chunks = {}
+            stats["chunks_unchanged"] = len(chunks) - len(changed)
+            stats.update(counts)
+            stats["chunks_deleted"] = len(stale_row_ids)
             
-            self.document_chunks[document_id] = chunks
+            await self.bump_kb_version()
+            self._schedule_table_maintenance(force_compaction=bool(stale_row_ids))
+            return stats
             
-            # Add each chunk to the vector database
-            for i, chunk in enumerate(chunks):
-                document = Document(
-                    content=chunk,
+        except Exception as e:
+            raise Exception(f"Failed to update document in knowledge base: {str(e)}")
+    
+    async def _embed_chunks(
+        self,
+        document_id: str,
+        source_file: str,
+        chunks: List[str],
+        indices: Iterable[int],
+        report: Callable[..., None],
+        columns: Dict[str, Any]
+    ) -> Dict[str, int]:
+        """Embed and insert the chunks at the given indices in batches.
+        
+        Returns the rows added and where their vectors came from (see _insert_chunk_batch).
+        columns are the document column values of the new rows (see _document_columns).
+        Rows are kept across document updates while their chunk moves, so the
+        payload holds no chunk position; see _apply_chunk_positions.
+        """
+        indices = list(indices)
+        counts = {"rows_added": 0, "chunks_embedded": 0, "chunks_copied": 0, "chunks_cached": 0}
+        for start in range(0, len(indices), self.embed_batch_size):
+            batch = indices[start:start + self.embed_batch_size]
+            documents = [
+                Document(
+                    content=chunks[i],
                     id=f"{document_id}_chunk_{i}",
-                    name=f"Customer Support Guide - Chunk {i+1}",
+                    name="Customer Support Guide",
                     meta_data={
-                        "source_file": file_path,
+                        "source_file": source_file,
                         "document_id": document_id,
-                        "chunk_id": i,
-                        "chunk_size": len(chunk)
+                        "chunk_size": len(chunks[i])
                     }
                 )
-                
-                # Try to add to vector database, but don't fail if it doesn't work
-                try:
-                    await self.vector_db.async_insert([document])
-                except Exception as e:
-                    print(f"Warning: Could not add to vector database: {e}")
-                    # Continue with in-memory storage
+                for i in batch
+            ]
             
-        except Exception as e:
-            raise Exception(f"Failed to add document to knowledge base: {str(e)}")
+            try:
+                batch_counts = await self._insert_chunk_batch_with_retry(documents, columns)
+            except Exception as e:
+                report(error=f"Chunks {batch[0]}-{batch[-1]}: could not add to vector database: {e}")
+                raise Exception(f"Chunks {batch[0]}-{batch[-1]} could not be added to the vector database: {str(e)}")
+            for key, value in batch_counts.items():
+                counts[key] += value
+            report(chunks_embedded=start + len(batch))
+        return counts
     
-    def chunk_content(self, content: str, chunk_size: int = 1000) -> List[str]:
-        """Split content into chunks"""
-        chunks = []
-        words = content.split()
-        current_chunk = []
-        current_size = 0
-        
-        for word in words:
-            word_size = len(word) + 1  # +1 for space
-            if current_size + word_size > chunk_size and current_chunk:
-                chunks.append(" ".join(current_chunk))
-                current_chunk = [word]
-                current_size = word_size
+    def _delete_rows(self, document_id: str, row_ids: Iterable[str], batch_size: int = 500):
+        """Delete a document's LanceDB rows by id"""
+        row_ids = list(row_ids)
+        for start in range(0, len(row_ids), batch_size):
+            ids = ", ".join(f"'{row_id}'" for row_id in row_ids[start:start + batch_size])
+            self.vector_db.table.delete(f"document_id = {sql_string(document_id)} AND id IN ({ids})")
+    
+    def _delete_document_rows(self, document_id: str) -> int:
+        """Delete all LanceDB rows of a document; returns how many there were"""
+        where = f"document_id = {sql_string(document_id)}"
+        count = self.vector_db.table.count_rows(where)
+        if count:
+            self.vector_db.table.delete(where)
+        return count
+    
+    def _set_document_category(self, document_id: str, category: Optional[str]):
+        """Rewrite the category column of a document's rows"""
+        self.vector_db.table.update(
+            where=f"document_id = {sql_string(document_id)}",
+            values={"category": category}
+        )
+    
+    def _document_columns(self, document_id: str) -> Dict[str, Any]:
+        """Values of the document columns (see DOCUMENT_COLUMNS) for a tracked document's rows"""
+        document_info = self.documents.get(document_id) or {}
+        uploaded_at = document_info.get("uploaded_at")
+        return {
+            "document_id": document_id,
+            "category": document_info.get("category"),
+            "uploaded_at": datetime.fromisoformat(uploaded_at) if uploaded_at else None
+        }
+    
+    def _add_content_column(self, batch_size: int = 1000):
+        """Add the content column to a knowledge base table created without it.
+        
+        The text is copied out of each row's JSON payload. Rows with the same id hold
+        the same content, so each batch is one merge on id. The registry records a
+        backfill in progress, so an interrupted one resumes on the next startup.
+        """
+        table = self.vector_db.table
+        if CONTENT_COLUMN.name in table.schema.names:
+            if self.registry.get_meta("content_backfill") != "pending":
+                return
+        else:
+            table.add_columns([CONTENT_COLUMN])
+            if table.count_rows() == 0:
+                return
+            self.registry.set_meta("content_backfill", "pending")
+        
+        print("Migrating knowledge base table: adding the content column")
+        rows = table.search().where("content IS NULL").select(["id", "payload"]).limit(None).to_list()
+        contents = {}
+        for row in rows:
+            contents.setdefault(row["id"], json.loads(row["payload"]).get("content") or "")
+        row_ids = list(contents)
+        for start in range(0, len(row_ids), batch_size):
+            batch = row_ids[start:start + batch_size]
+            source = pa.table({"id": batch, "content": [contents[row_id] for row_id in batch]})
+            table.merge_insert("id").when_matched_update_all().execute(source)
+        self.registry.set_meta("content_backfill", "done")
+    
+    def _add_document_columns(self):
+        """Add the document columns to a knowledge base table created without them.
+        
+        Each row is assigned the document named in its payload's meta_data, which
+        every version of the table has stored. Tables that shared one row between all
+        documents containing the same chunk then give every other ingested document
+        its own copy of the row (vectors are copied, not re-embedded). Rows whose
+        payload names no document are kept, and only deleted when
+        MIGRATION_DROP_UNOWNED_ROWS is set.
+        """
+        table = self.vector_db.table
+        if "document_id" in table.schema.names:
+            return
+        table.add_columns(DOCUMENT_COLUMNS)
+        if table.count_rows() == 0:
+            return
+        
+        print("Migrating knowledge base table: adding document columns")
+        rows = (
+            table.search().where("document_id IS NULL").select(["payload"])
+            .with_row_id(True).limit(None).to_list()
+        )
+        owned_rows: Dict[str, List[int]] = {}
+        for row in rows:
+            meta_data = json.loads(row["payload"]).get("meta_data") or {}
+            if meta_data.get("document_id"):
+                owned_rows.setdefault(str(meta_data["document_id"]), []).append(row["_rowid"])
+        # Row addresses of rows an update does not touch stay valid, so all updates use this one scan
+        for document_id, addresses in owned_rows.items():
+            for start in range(0, len(addresses), 500):
+                batch = ", ".join(str(address) for address in addresses[start:start + 500])
+                table.update(where=f"_rowid IN ({batch})", values=self._document_columns(document_id))
+        
+        for document_id, document_info in self.documents.items():
+            if document_info.get("status") != "ingested":
+                continue
+            columns = self._document_columns(document_id)
+            row_ids = sorted(set(self.registry.get_row_ids(document_id)))
+            for start in range(0, len(row_ids), 500):
+                ids = ", ".join(f"'{row_id}'" for row_id in row_ids[start:start + 500])
+                rows = (
+                    table.search().where(f"id IN ({ids})")
+                    .select(["id", "vector", "payload", "document_id"]).limit(None).to_list()
+                )
+                own = {row["id"] for row in rows if row["document_id"] == document_id}
+                copies = {}
+                for row in rows:
+                    if row["id"] in own or row["id"] in copies:
+                        continue
+                    payload = json.loads(row["payload"])
+                    payload["meta_data"] = {**payload["meta_data"], "document_id": document_id}
+                    copies[row["id"]] = {
+                        "id": row["id"],
+                        "vector": row["vector"],
+                        "payload": json.dumps(payload),
+                        "content": payload["content"],
+                        **columns
+                    }
+                if copies:
+                    table.add(list(copies.values()))
+        
+        unowned = table.count_rows("document_id IS NULL")
+        if unowned and self.migration_drop_unowned_rows:
+            table.delete("document_id IS NULL")
+            print(f"Deleted {unowned} rows without a document_id")
+        elif unowned:
+            print(f"Warning: {unowned} rows have no document_id; kept, set MIGRATION_DROP_UNOWNED_ROWS=true to delete them")
+    
+    @staticmethod
+    def chunk_row_id(content: str) -> str:
+        """LanceDB row id of a chunk: the md5 of its content, as assigned by LanceDb.insert"""
+        return md5(content.replace("\x00", "\ufffd").encode()).hexdigest()
+    
+    def _insert_chunk_batch(self, documents: List[Document], columns: Dict[str, Any]) -> Dict[str, int]:
+        """Embed a batch of one document's chunks in one request and add them to LanceDB in one write.
+        
+        Rows use the same layout as LanceDb.insert (md5 of the content as id, JSON
+        payload) plus the document columns. Each document has its own rows, so
+        metadata filters are plain column prefilters. Chunks the document already
+        has a row for are skipped; chunks another document has a row for copy its
+        vector, and chunks found in the embedding cache reuse their cached vector,
+        so the same content is never embedded twice. Returns the number of rows added
+        and how many of their vectors were embedded, copied or taken from the cache.
+        """
+        pending: Dict[str, Tuple[Document, str]] = {}
+        for document in documents:
+            content = document.content.replace("\x00", "\ufffd")
+            pending.setdefault(self.chunk_row_id(content), (document, content))
+        
+        table = self.vector_db.table
+        ids = ", ".join(f"'{row_id}'" for row_id in pending)
+        existing = table.search().where(f"id IN ({ids})").select(["id", "document_id", "vector"]).limit(None).to_arrow()
+        stored: Dict[str, List[float]] = {}
+        for row_id, document_id, vector in zip(
+            existing["id"].to_pylist(), existing["document_id"].to_pylist(), existing["vector"].to_pylist()
+        ):
+            if document_id == columns["document_id"]:
+                pending.pop(row_id, None)
             else:
-                current_chunk.append(word)
-                current_size += word_size
-        
-        if current_chunk:
-            chunks.append(" ".join(current_chunk))
-        
-        return chunks
-    
-    def semantic_search_fallback(self, query: str, max_results: int) -> List[Document]:
-        """Fallback semantic search using stored document chunks"""
-        if not hasattr(self, 'document_chunks') or not self.document_chunks:
-            return []
-        
-        # Simple keyword-based search as fallback
-        query_lower = query.lower()
-        relevant_chunks = []
-        
-        for doc_id, chunks in self.document_chunks.items():
-            for i, chunk in enumerate(chunks):
-                chunk_lower = chunk.lower()
-                
-                # Calculate relevance score based on keyword matches
-                score = 0
-                query_words = query_lower.split()
-                for word in query_words:
-                    if word in chunk_lower:
-                        score += 1
-                
-                if score > 0:
-                    # Create a Document object for consistency
-                    document = Document(
-                        content=chunk,
-                        id=f"{doc_id}_chunk_{i}",
-                        name=f"Document Chunk {i+1}",
-                        meta_data={
-                            "source_file": self.documents.get(doc_id, {}).get("file_path", "unknown"),
-                            "document_id": doc_id,
-                            "chunk_id": i,
-                            "relevance_score": score
-                        }
-                    )
-                    relevant_chunks.append((document, score))
-        
-        # Sort by relevance score and return top results
-        relevant_chunks.sort(key=lambda x: x[1], reverse=True)
-        return [doc for doc, score in relevant_chunks[:max_results]]
+                stored[row_id] = vector
+        counts = {"rows_added": 0, "chunks_embedded": 0, "chunks_copied": 0, "chunks_cached": 0}
+        if not pending:
+            return counts
+        
+        embeddings = {row_id: stored[row_id] for row_id in pending if row_id in stored}
+        counts["chunks_copied"] = len(embeddings)
+        missing = {row_id: content for row_id, (_, content) in pending.items() if row_id not in stored}
+        if missing:
+            new_embeddings, counts["chunks_embedded"] = self._embed_chunk_contents(missing)
+            embeddings.update(new_embeddings)
+            counts["chunks_cached"] = len(missing) - counts["chunks_embedded"]
+        rows = []
+        for row_id, (document, content) in pending.items():
+            embedding = embeddings[row_id]
+            payload = {
+                "name": document.name,
+                "meta_data": document.meta_data,
+                "content": content,
+                "usage": None
+            }
+            rows.append({
+                "id": row_id,
+                "vector": embedding,
+                "payload": json.dumps(payload),
+                "content": content,
+                **columns
+            })
+        
+        table.add(rows)
+        counts["rows_added"] = len(rows)
+        return counts
+    
+    def _embed_chunk_contents(self, contents: Dict[str, str]) -> Tuple[Dict[str, List[float]], int]:
+        """Embed chunk contents by row id, consulting the embedding cache first.
+        
+        Returns the embeddings and how many of them had to be requested from the embedder.
+        """
+        if not self.embedding_cache:
+            return dict(zip(contents, self.embedder.embed_batch(list(contents.values())))), len(contents)
+        
+        model = self.embedder.model_key
+        embeddings = self.embedding_cache.get_many(model, contents)
+        missing = [row_id for row_id in contents if row_id not in embeddings]
+        if missing:
+            vectors = self.embedder.embed_batch([contents[row_id] for row_id in missing])
+            self.embedding_cache.put_many(model, zip(missing, vectors))
+            embeddings.update(zip(missing, vectors))
+        return embeddings, len(missing)
+    
+    async def _insert_chunk_batch_with_retry(self, documents: List[Document], columns: Dict[str, Any]) -> Dict[str, int]:
+        """Insert a batch of chunks, retrying with exponential backoff; raises after the last retry"""
+        attempt = 0
+        while True:
+            try:
+                return await asyncio.to_thread(self._insert_chunk_batch, documents, columns)
+            except Exception as e:
+                if attempt >= self.embed_batch_retries:
+                    raise
+                delay = self.embed_retry_backoff * (2 ** attempt)
+                attempt += 1
+                print(f"Warning: Embedding batch failed ({e}), retry {attempt}/{self.embed_batch_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
+    def chunk_content(
+        self,
+        content: str,
+        chunk_size: Optional[int] = None,
+        overlap: Optional[int] = None
+    ) -> List[str]:
+        """Split content into chunks"""
+        return chunk_text(
+            content,
+            chunk_size or self.chunk_size,
+            self.chunk_overlap if overlap is None else overlap
+        )
+    
+    def semantic_search_fallback(
+        self,
+        query: str,
+        max_results: int,
+        document_ids: Optional[Set[str]] = None
+    ) -> List[Document]:
+        """Fallback keyword search over stored document chunks using the BM25 index; called from worker threads"""
+        self._ensure_keyword_index()
+        with self._keyword_index_lock:
+            hits = [
+                (doc_id, i, score, self.document_chunks.get(doc_id))
+                for (doc_id, i), score in self.keyword_index.search(query, max_results, document_ids)
+            ]
+        
+        results = []
+        for doc_id, i, score, chunks in hits:
+            if not chunks or i >= len(chunks):
+                continue
+            
+            # Create a Document object for consistency
+            results.append(Document(
+                content=chunks[i],
+                id=f"{doc_id}_chunk_{i}",
+                name=f"Document Chunk {i+1}",
+                meta_data={
+                    "source_file": self.documents.get(doc_id, {}).get("file_path", "unknown"),
+                    "document_id": doc_id,
+                    "chunk_id": i,
+                    "relevance_score": round(score, 4)
+                },
+                reranking_score=score
+            ))
+        
+        return results
     
     async def reload_knowledge_base(self):
         """Reload the knowledge base with current documents"""
         try:
-            # For now, we'll just clear the agent cache
+            # For now, we'll just clear the agent pool
             # Documents are already in the vector database
-            self.agents.clear()
+            await self.agent_pool.clear()
             
         except Exception as e:
             raise Exception(f"Failed to reload knowledge base: {str(e)}")
@@ -1,12 +1,25 @@
 import os
 import uuid
 import shutil
+import hashlib
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, Tuple, AsyncIterator
+from contextlib import asynccontextmanager
 from datetime import datetime
 import asyncio
 
 from .knowledge_service import KnowledgeService
+from .single_flight import SingleFlight
+
+
+def file_sha256(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 
 class PDFService:
     def __init__(self):
@@ -15,85 +28,233 @@ class PDFService:
         
         # Reference to knowledge service (will be set after initialization)
         self.knowledge_service: Optional[KnowledgeService] = None
+        
+        # Concurrent uploads of the same file are ingested once
+        self.inflight_uploads = SingleFlight()
+        self._update_locks: Dict[str, asyncio.Lock] = {}  # Serializes ingestion, updates and deletes per document
+        self._update_lock_users: Dict[str, int] = {}  # Holders and waiters of each lock; unused locks are dropped
     
     def set_knowledge_service(self, knowledge_service: KnowledgeService):
         """Set reference to knowledge service"""
         self.knowledge_service = knowledge_service
     
+    @asynccontextmanager
+    async def _document_lock(self, document_id: str) -> AsyncIterator[None]:
+        """Hold the document's lock; it is forgotten once nobody holds or waits for it"""
+        lock = self._update_locks.setdefault(document_id, asyncio.Lock())
+        self._update_lock_users[document_id] = self._update_lock_users.get(document_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._update_lock_users[document_id] -= 1
+            if not self._update_lock_users[document_id]:
+                del self._update_lock_users[document_id]
+                del self._update_locks[document_id]
+    
     async def process_and_ingest_pdf(
         self, 
         file_path: str, 
         document_name: str,
-        category: Optional[str] = None
+        category: Optional[str] = None,
+        document_id: Optional[str] = None,
+        progress_callback: Optional[Callable[..., None]] = None
     ) -> str:
-        """Process and ingest a PDF file into the knowledge base"""
+        """Process and ingest a PDF file into the knowledge base.
+        
+        Uploads are content-addressed: if a file with identical content is already
+        in the knowledge base, its document_id is returned and nothing is re-ingested.
+        """
+        document_id, _ = await self.ingest_pdf(
+            file_path, document_name, category, document_id, progress_callback
+        )
+        return document_id
+    
+    async def ingest_pdf(
+        self,
+        file_path: str,
+        document_name: str,
+        category: Optional[str] = None,
+        document_id: Optional[str] = None,
+        progress_callback: Optional[Callable[..., None]] = None,
+        content_hash: Optional[str] = None
+    ) -> Tuple[str, bool]:
+        """Like process_and_ingest_pdf, but returns (document_id, deduplicated).
+        
+        deduplicated is True when identical content had been ingested by another
+        upload, in which case document_name and category were not applied.
+        """
         
         if not self.knowledge_service:
             raise Exception("Knowledge service not initialized")
         
-        # Generate unique document ID
-        document_id = str(uuid.uuid4())
-        
-        # Copy file to uploads directory
-        dest_path = self.upload_dir / f"{document_id}.pdf"
-        shutil.copy2(file_path, dest_path)
-        
-        # Create document info
-        document_info = {
-            "id": document_id,
-            "name": document_name,
-            "category": category,
-            "file_path": str(dest_path),
-            "uploaded_at": datetime.utcnow().isoformat(),
-            "file_size": os.path.getsize(dest_path),
-            "status": "uploaded"
-        }
-        
-        # Add to knowledge service tracking
-        self.knowledge_service.add_document(document_id, document_info)
-        print(f"DEBUG: Document added to tracking: {document_id}")
-        
-        # Update the knowledge base with the new PDF file
-        try:
-            await self.knowledge_service.add_document_to_knowledge_base(document_id, str(dest_path))
-            print(f"DEBUG: Document added to knowledge base: {document_id}")
-        except Exception as e:
-            print(f"DEBUG: Error adding to knowledge base: {e}")
-            raise
+        content_hash = content_hash or await asyncio.to_thread(file_sha256, file_path)
+        
+        async def ingest() -> Tuple[str, bool]:
+            existing = self.knowledge_service.find_document_by_hash(content_hash)
+            if existing:
+                print(f"DEBUG: Identical content already ingested as document: {existing['id']}")
+                return existing["id"], False
+            new_document_id = await self._ingest_new_pdf(
+                file_path, document_name, category, content_hash, document_id, progress_callback
+            )
+            return new_document_id, True
+        
+        # Uploads of a file that is still being ingested wait for that ingestion
+        (result, ingested), shared = await self.inflight_uploads.do(content_hash, ingest)
+        return result, shared or not ingested
+    
+    async def _ingest_new_pdf(
+        self,
+        file_path: str,
+        document_name: str,
+        category: Optional[str],
+        content_hash: str,
+        document_id: Optional[str] = None,
+        progress_callback: Optional[Callable[..., None]] = None
+    ) -> str:
+        """Copy a new PDF into the uploads directory and ingest it"""
+        # Generate unique document ID unless the caller (e.g. an ingestion job) already assigned one
+        document_id = document_id or str(uuid.uuid4())
         
-        # Update status
-        document_info["status"] = "ingested"
-        self.knowledge_service.add_document(document_id, document_info)
-        print(f"DEBUG: Document status updated to ingested: {document_id}")
+        # Held for the whole ingestion: a delete of the document waits for it to
+        # finish instead of racing its batches and final registry write
+        async with self._document_lock(document_id):
+            # Copy file to uploads directory
+            dest_path = self.upload_dir / f"{document_id}.pdf"
+            shutil.copy2(file_path, dest_path)
+            
+            # Create document info
+            document_info = {
+                "id": document_id,
+                "name": document_name,
+                "category": category,
+                "file_path": str(dest_path),
+                "uploaded_at": datetime.utcnow().isoformat(),
+                "file_size": os.path.getsize(dest_path),
+                "content_hash": content_hash,
+                "status": "uploaded"
+            }
+            
+            # Add to knowledge service tracking
+            self.knowledge_service.add_document(document_id, document_info)
+            print(f"DEBUG: Document added to tracking: {document_id}")
+            
+            # Update the knowledge base with the new PDF file
+            try:
+                ingestion_stats = await self.knowledge_service.add_document_to_knowledge_base(
+                    document_id, str(dest_path), progress_callback=progress_callback
+                )
+                print(f"DEBUG: Document added to knowledge base: {document_id}")
+            except Exception as e:
+                print(f"DEBUG: Error adding to knowledge base: {e}")
+                # Drop the failed document with the chunks and rows it stored; the error is
+                # reported by the caller (e.g. the ingestion job) and a later upload starts over
+                try:
+                    await self.knowledge_service.remove_document(document_id)
+                except Exception as cleanup_error:
+                    print(f"Warning: Could not remove failed document {document_id}: {cleanup_error}")
+                dest_path.unlink(missing_ok=True)
+                raise
+            
+            # Update status
+            document_info["status"] = "ingested"
+            document_info["ingestion_stats"] = ingestion_stats
+            self.knowledge_service.add_document(document_id, document_info)
+            print(f"DEBUG: Document status updated to ingested: {document_id}")
         
         return document_id
     
-    async def remove_document(self, document_id: str) -> bool:
-        """Remove a document from the knowledge base"""
+    async def update_document(
+        self,
+        document_id: str,
+        file_path: str,
+        document_name: Optional[str] = None,
+        category: Optional[str] = None,
+        progress_callback: Optional[Callable[..., None]] = None
+    ) -> str:
+        """Replace an ingested document with a new version of the PDF.
+        
+        Only chunks that changed between the versions are embedded; an identical
+        file is a no-op.
+        """
         
         if not self.knowledge_service:
             raise Exception("Knowledge service not initialized")
         
-        document_info = self.knowledge_service.get_document(document_id)
-        if not document_info:
-            return False
-        
-        try:
-            # Remove file
-            file_path = Path(document_info["file_path"])
-            if file_path.exists():
-                file_path.unlink()
+        async with self._document_lock(document_id):
+            document_info = self.knowledge_service.get_document(document_id)
+            if not document_info:
+                raise Exception(f"Document not found: {document_id}")
             
-            # Remove from tracking
-            self.knowledge_service.documents.pop(document_id, None)
+            content_hash = await asyncio.to_thread(file_sha256, file_path)
+            if content_hash == document_info.get("content_hash") and document_info.get("status") == "ingested":
+                print(f"DEBUG: Document content unchanged: {document_id}")
+                return document_id
             
-            # Reload knowledge base
-            await self.knowledge_service.reload_knowledge_base()
+            # Keep the current file until the new version is in the knowledge base
+            dest_path = self.upload_dir / f"{document_id}.pdf"
+            staged_path = self.upload_dir / f"{document_id}.pdf.new"
+            shutil.copy2(file_path, staged_path)
+            category = category if category is not None else document_info.get("category")
             
-            return True
+            try:
+                ingestion_stats = await self.knowledge_service.update_document_in_knowledge_base(
+                    document_id,
+                    str(staged_path),
+                    progress_callback=progress_callback,
+                    source_file=str(dest_path),
+                    category=category
+                )
+            except Exception as e:
+                print(f"DEBUG: Error updating document in knowledge base: {e}")
+                staged_path.unlink(missing_ok=True)
+                raise
+            os.replace(staged_path, dest_path)
+            
+            self.knowledge_service.add_document(document_id, {
+                **document_info,
+                "name": document_name or document_info["name"],
+                "category": category,
+                "file_path": str(dest_path),
+                "updated_at": datetime.utcnow().isoformat(),
+                "file_size": os.path.getsize(dest_path),
+                "content_hash": content_hash,
+                "status": "ingested",
+                "ingestion_stats": ingestion_stats
+            })
+            print(f"DEBUG: Document updated: {document_id}")
+        
+        return document_id
+    
+    async def remove_document(self, document_id: str) -> bool:
+        """Remove a document from the knowledge base"""
+        
+        if not self.knowledge_service:
+            raise Exception("Knowledge service not initialized")
+        
+        # Wait for a running update of the same document instead of racing it
+        async with self._document_lock(document_id):
+            document_info = self.knowledge_service.get_document(document_id)
+            if not document_info:
+                return False
             
-        except Exception as e:
-            raise Exception(f"Failed to remove document: {str(e)}")
+            try:
+                # Remove its chunks from the vector database and from tracking (also invalidates cached answers)
+                await self.knowledge_service.remove_document(document_id)
+                
+                # Remove file
+                file_path = Path(document_info["file_path"])
+                if file_path.exists():
+                    file_path.unlink()
+                
+                # Reload knowledge base
+                await self.knowledge_service.reload_knowledge_base()
+                
+            except Exception as e:
+                raise Exception(f"Failed to remove document: {str(e)}")
+        
+        return True
     
     def get_document_path(self, document_id: str) -> Optional[str]:
         """Get the file path for a document"""
@@ -0,0 +1,93 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Document upload times are stored as naive UTC; convert aware datetimes to match"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def sql_string(value: str) -> str:
+    """Quote a string as an SQL literal for LanceDB filters"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _sql_timestamp(value: datetime) -> str:
+    return f"timestamp '{value.isoformat(sep=' ')}'"
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """Restricts retrieval to the documents matching every given condition.
+
+    Frozen (and therefore hashable) so it can be part of answer cache and
+    in-flight query keys.
+    """
+
+    category: Optional[str] = None
+    document_ids: Optional[Tuple[str, ...]] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
+    @classmethod
+    def create(
+        cls,
+        category: Optional[str] = None,
+        document_ids: Optional[Iterable[str]] = None,
+        uploaded_after: Optional[datetime] = None,
+        uploaded_before: Optional[datetime] = None
+    ) -> Optional["SearchFilters"]:
+        """Build filters from request parameters; returns None when nothing is filtered"""
+        if category is None and document_ids is None and uploaded_after is None and uploaded_before is None:
+            return None
+        return cls(
+            category=category,
+            document_ids=tuple(sorted(set(document_ids))) if document_ids is not None else None,
+            uploaded_after=_naive_utc(uploaded_after),
+            uploaded_before=_naive_utc(uploaded_before)
+        )
+
+    def matches(self, document_info: Dict[str, Any]) -> bool:
+        """Whether a tracked document satisfies the filters"""
+        if self.category is not None and document_info.get("category") != self.category:
+            return False
+        if self.document_ids is not None and document_info.get("id") not in self.document_ids:
+            return False
+        if self.uploaded_after is not None or self.uploaded_before is not None:
+            uploaded_at = document_info.get("uploaded_at")
+            if not uploaded_at:
+                return False
+            uploaded_at = datetime.fromisoformat(uploaded_at)
+            if self.uploaded_after is not None and uploaded_at < self.uploaded_after:
+                return False
+            if self.uploaded_before is not None and uploaded_at > self.uploaded_before:
+                return False
+        return True
+
+    def where_clause(self) -> str:
+        """SQL prefilter on the document_id, category and uploaded_at columns of the knowledge base table"""
+        conditions = []
+        if self.category is not None:
+            conditions.append(f"category = {sql_string(self.category)}")
+        if self.document_ids is not None:
+            if self.document_ids:
+                conditions.append(f"document_id IN ({', '.join(sql_string(i) for i in self.document_ids)})")
+            else:
+                conditions.append("false")
+        if self.uploaded_after is not None:
+            conditions.append(f"uploaded_at >= {_sql_timestamp(self.uploaded_after)}")
+        if self.uploaded_before is not None:
+            conditions.append(f"uploaded_at <= {_sql_timestamp(self.uploaded_before)}")
+        return " AND ".join(conditions)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly form, echoed in responses"""
+        return {
+            "category": self.category,
+            "document_ids": list(self.document_ids) if self.document_ids is not None else None,
+            "uploaded_after": self.uploaded_after.isoformat() if self.uploaded_after else None,
+            "uploaded_before": self.uploaded_before.isoformat() if self.uploaded_before else None,
+        }
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import lancedb
+import pyarrow as pa
+
+
+class SemanticAnswerCache:
+    """Answer cache that matches queries by embedding similarity.
+
+    Entries live in their own LanceDB table next to the knowledge base table, so
+    paraphrases of an already answered question ("How do I reset my password" /
+    "password reset steps") can be served without another LLM round-trip. Every
+    miss is a brute-force search over the table, so it is kept to max_entries
+    by evicting the oldest entries.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        table_name: str,
+        embedder,
+        similarity_threshold: float = 0.92,
+        ttl_seconds: float = 86400,
+        max_entries: int = 10000
+    ):
+        self.embedder = embedder
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.table_name = table_name
+        self.connection = lancedb.connect(uri)
+        self.table = self.connection.create_table(
+            table_name,
+            schema=self._schema(),
+            exist_ok=True
+        )
+
+        self.entries = self.table.count_rows()  # Counted on purges, estimated in between
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def _schema(self) -> pa.Schema:
+        return pa.schema([
+            pa.field("vector", pa.list_(pa.float32(), self.embedder.dimensions)),
+            pa.field("id", pa.string()),
+            pa.field("query", pa.string()),
+            pa.field("max_results", pa.int64()),
+            pa.field("kb_version", pa.int64()),
+            pa.field("created_at", pa.float64()),
+            pa.field("answer", pa.string()),
+        ])
+
+    async def embed(self, query: str) -> List[float]:
+        """Embed a query without blocking the event loop"""
+        return await asyncio.to_thread(self.embedder.get_embedding, query)
+
+    async def lookup(
+        self,
+        embedding: List[float],
+        max_results: int,
+        kb_version: int
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached answer of the nearest previous query above the similarity threshold"""
+        where = f"kb_version = {int(kb_version)} AND max_results = {int(max_results)}"
+        if self.ttl_seconds > 0:
+            where += f" AND created_at >= {time.time() - self.ttl_seconds}"
+
+        rows = await asyncio.to_thread(
+            lambda: self.table.search(embedding)
+            .distance_type("cosine")
+            .where(where, prefilter=True)
+            .limit(1)
+            .to_list()
+        )
+
+        if rows:
+            similarity = 1.0 - float(rows[0]["_distance"])
+            if similarity >= self.similarity_threshold:
+                self.hits += 1
+                return {
+                    "answer": json.loads(rows[0]["answer"]),
+                    "matched_query": rows[0]["query"],
+                    "similarity": round(similarity, 4)
+                }
+
+        self.misses += 1
+        return None
+
+    async def store(
+        self,
+        query: str,
+        embedding: List[float],
+        max_results: int,
+        kb_version: int,
+        answer: Dict[str, Any]
+    ):
+        """Store a generated answer under the query embedding"""
+        row = {
+            "vector": embedding,
+            "id": str(uuid.uuid4()),
+            "query": query,
+            "max_results": int(max_results),
+            "kb_version": int(kb_version),
+            "created_at": time.time(),
+            "answer": json.dumps(answer),
+        }
+        await asyncio.to_thread(self.table.add, [row])
+        self.stores += 1
+        self.entries += 1
+        if self.max_entries and self.entries > self.max_entries:
+            await asyncio.to_thread(self.evict_oldest)
+
+    def purge(self, kb_version: int) -> int:
+        """Delete entries generated against an older knowledge base version or past their TTL.
+
+        Also evicts the oldest entries beyond max_entries. Returns the number of
+        entries deleted.
+        """
+        before = self.table.count_rows()
+        where = f"kb_version < {int(kb_version)}"
+        if self.ttl_seconds > 0:
+            where += f" OR created_at < {time.time() - self.ttl_seconds}"
+        self.table.delete(where)
+        self.entries = self.table.count_rows()
+        self.evict_oldest()
+        return before - self.entries
+
+    def evict_oldest(self, batch_size: int = 500):
+        """Delete the oldest entries until at most max_entries are left"""
+        excess = self.table.count_rows() - self.max_entries
+        if not self.max_entries or excess <= 0:
+            return
+        rows = self.table.search().select(["id", "created_at"]).limit(None).to_arrow()
+        oldest = rows.sort_by("created_at")["id"].to_pylist()[:excess]
+        for start in range(0, len(oldest), batch_size):
+            ids = ", ".join(f"'{row_id}'" for row_id in oldest[start:start + batch_size])
+            self.table.delete(f"id IN ({ids})")
+        self.evictions += len(oldest)
+        self.entries = self.table.count_rows()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "table": self.table_name,
+            "entries": self.table.count_rows(),
+            "similarity_threshold": self.similarity_threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
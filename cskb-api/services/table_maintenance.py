@@ -0,0 +1,175 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    # Internal to lancedb; only used to read optimize() statistics, see _optimize
+    from lancedb.background_loop import LOOP
+except ImportError:
+    LOOP = None
+
+
+class TableMaintenance:
+    """Compacts the fragments of a LanceDB table and prunes its old versions.
+
+    Every insert batch writes a new fragment and every delete leaves a deletion
+    file behind, so the table becomes many small fragments that each search has
+    to open and scan. Compaction rewrites them into a few large fragments and
+    drops deleted rows for good, keeping scan cost proportional to live data.
+    Every write also creates a table version whose files are kept until versions
+    older than version_retention_seconds are pruned.
+
+    vector_db is anything with a .table attribute (LanceDb, SemanticAnswerCache).
+    """
+
+    def __init__(
+        self,
+        vector_db,
+        min_small_fragments: int = 16,
+        version_retention_seconds: float = 86400
+    ):
+        self.vector_db = vector_db
+        self.min_small_fragments = min_small_fragments
+        self.version_retention_seconds = version_retention_seconds
+
+        self._lock = threading.Lock()  # One compaction at a time; searches never wait on it
+        self.running = False
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self.runs = 0
+        self.files_removed_total = 0
+        self.bytes_removed_total = 0
+        self.old_versions_removed_total = 0
+
+    @property
+    def table(self):
+        return self.vector_db.table
+
+    def fragment_stats(self) -> Dict[str, Any]:
+        """Return fragment, row and size counts of the table"""
+        stats = self.table.stats()
+        fragments = stats["fragment_stats"]
+        return {
+            "fragments": fragments["num_fragments"],
+            "small_fragments": fragments["num_small_fragments"],
+            "rows": stats["num_rows"],
+            "bytes": stats["total_bytes"]
+        }
+
+    def disk_usage(self) -> Tuple[Optional[int], Optional[int]]:
+        """Return the (file count, bytes) of the table directory, or (None, None) for remote tables"""
+        path = Path(self.table.uri)
+        if not path.is_dir():
+            return None, None
+        files, size = 0, 0
+        for root, _, names in os.walk(path):
+            for name in names:
+                try:
+                    size += os.path.getsize(os.path.join(root, name))
+                    files += 1
+                except OSError:
+                    pass  # Removed by a concurrent write
+        return files, size
+
+    def needs_compaction(self, stats: Dict[str, Any]) -> bool:
+        return stats["small_fragments"] >= self.min_small_fragments
+
+    def maybe_compact(self, force: bool = False) -> bool:
+        """Compact the table and prune old versions if it has accumulated enough small fragments.
+
+        Returns whether it ran.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False  # A compaction is already running
+        try:
+            before = self.fragment_stats()
+            if not force and not self.needs_compaction(before):
+                return False
+            self._compact(before)
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Warning: Could not compact LanceDB table: {e}")
+            return False
+        finally:
+            self._lock.release()
+
+    def _optimize(self):
+        """Compact the table and prune old versions; returns LanceDB's OptimizeStats, or None.
+
+        Merges small fragments, materializes deletions, adds new rows to existing
+        indexes and deletes the files of versions older than the retention window.
+        LanceTable.optimize() discards the statistics (and compact_files() /
+        cleanup_old_versions() need pylance), so this awaits the optimize() of the
+        async table it wraps on LanceDB's background loop. Those are lancedb
+        internals (requirements.txt pins the version they were written against);
+        if they are missing the public optimize() runs and None is returned.
+        """
+        cleanup_older_than = timedelta(seconds=self.version_retention_seconds)
+        async_table = getattr(self.table, "_table", None)
+        if LOOP is None or not hasattr(async_table, "optimize"):
+            print("Warning: LanceDB optimize statistics unavailable, compacting without them")
+            self.table.optimize(cleanup_older_than=cleanup_older_than)
+            return None
+        return LOOP.run(async_table.optimize(cleanup_older_than=cleanup_older_than))
+
+    def _compact(self, before: Dict[str, Any]):
+        self.running = True
+        started = time.perf_counter()
+        try:
+            versions_before = len(self.table.list_versions())
+            stats = self._optimize()
+            after = self.fragment_stats()
+            self.last_error = None
+            self.last_run = {
+                "fragments_before": before["fragments"],
+                "fragments_after": after["fragments"],
+                "versions_before": versions_before,
+                "versions_after": len(self.table.list_versions()),
+                "fragments_removed": None,
+                "fragments_added": None,
+                "files_removed": None,
+                "files_added": None,
+                "bytes_removed": None,
+                "old_versions_removed": None,
+                "rows": after["rows"],
+                "seconds": round(time.perf_counter() - started, 2),
+                "finished_at": datetime.utcnow().isoformat()
+            }
+            if stats is not None:
+                self.last_run.update({
+                    "fragments_removed": stats.compaction.fragments_removed,
+                    "fragments_added": stats.compaction.fragments_added,
+                    "files_removed": stats.compaction.files_removed,
+                    "files_added": stats.compaction.files_added,
+                    "bytes_removed": stats.prune.bytes_removed,
+                    "old_versions_removed": stats.prune.old_versions_removed,
+                })
+                self.files_removed_total += stats.compaction.files_removed
+                self.bytes_removed_total += stats.prune.bytes_removed
+                self.old_versions_removed_total += stats.prune.old_versions_removed
+            self.runs += 1
+        finally:
+            self.running = False
+
+    def state(self) -> Dict[str, Any]:
+        """Return current fragment, version and file counts, settings and the last run"""
+        files, size = self.disk_usage()
+        return {
+            **self.fragment_stats(),
+            "versions": len(self.table.list_versions()),
+            "files": files,
+            "disk_bytes": size,
+            "min_small_fragments": self.min_small_fragments,
+            "version_retention_seconds": self.version_retention_seconds,
+            "running": self.running,
+            "runs": self.runs,
+            "files_removed_total": self.files_removed_total,
+            "bytes_removed_total": self.bytes_removed_total,
+            "old_versions_removed_total": self.old_versions_removed_total,
+            "last_run": self.last_run,
+            "last_error": self.last_error
+        }
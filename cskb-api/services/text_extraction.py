@@ -0,0 +1,137 @@
+"""CPU-bound text extraction and chunking.
+
+These functions run in the ingestion process pool, so this module must stay
+importable without the rest of the service (no agno / LanceDB imports).
+"""
+
+import re
+import zlib
+from typing import List, Optional, Tuple
+
+import PyPDF2
+
+
+def count_pdf_pages(file_path: str) -> int:
+    """Return the number of pages in a PDF"""
+    try:
+        with open(file_path, 'rb') as file:
+            return len(PyPDF2.PdfReader(file).pages)
+    except Exception as e:
+        raise Exception(f"Failed to read PDF: {str(e)}")
+
+
+def extract_pdf_pages(file_path: str, start: int = 0, end: Optional[int] = None) -> List[str]:
+    """Extract the text of pages [start, end) of a PDF, one string per page"""
+    try:
+        with open(file_path, 'rb') as file:
+            pages = PyPDF2.PdfReader(file).pages
+            end = len(pages) if end is None else min(end, len(pages))
+            return [pages[i].extract_text() for i in range(start, end)]
+    except Exception as e:
+        raise Exception(f"Failed to read PDF: {str(e)}")
+
+
+def join_pages(page_texts: List[str]) -> str:
+    """Join page texts into the document text (each page followed by a newline)"""
+    return "".join(f"{text}\n" for text in page_texts)
+
+
+def split_page_ranges(page_count: int, parts: int) -> List[Tuple[int, int]]:
+    """Split pages [0, page_count) into at most ``parts`` contiguous, similarly sized ranges"""
+    parts = max(1, min(parts, page_count))
+    size, remainder = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for i in range(parts):
+        end = start + size + (1 if i < remainder else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def extract_pdf_text(file_path: str) -> Tuple[str, int]:
+    """Extract the text of a PDF; returns the text and the number of pages"""
+    page_texts = extract_pdf_pages(file_path)
+    return join_pages(page_texts), len(page_texts)
+
+
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+WHITESPACE = re.compile(r"\s+")
+
+
+def _is_anchor(content: str, position: int, divisor: int) -> bool:
+    """Whether the sentence ending at position is a content-defined chunk boundary"""
+    return zlib.crc32(content[max(0, position - 16):position].encode()) % divisor == 0
+
+
+def _boundary(content: str, low: int, high: int, divisor: int) -> int:
+    """Pick where a chunk that must end within [low, high] ends.
+
+    Preference: a paragraph break, then a content-defined sentence end (an
+    anchor), then the last sentence end, then the last whitespace. Paragraph
+    breaks and anchors depend only on the surrounding text, so after an edit
+    later chunks are cut at the same places as before.
+    """
+    match = PARAGRAPH_BREAK.search(content, low, high)
+    if match:
+        return match.start()
+
+    last_sentence_end = None
+    for match in SENTENCE_END.finditer(content, low, high):
+        end = match.start() + 1
+        if _is_anchor(content, end, divisor):
+            return end
+        last_sentence_end = end
+    if last_sentence_end is not None:
+        return last_sentence_end
+
+    space = max(content.rfind(" ", low, high), content.rfind("\n", low, high))
+    return space if space > low else high
+
+
+def chunk_text_spans(content: str, chunk_size: int = 1000, overlap: int = 0) -> List[Tuple[int, int]]:
+    """Split content into chunks of at most chunk_size characters; returns (start, end) offsets.
+
+    Chunks end on paragraph or sentence boundaries where possible and are at
+    least half of chunk_size unless the text runs out. Each chunk after the first
+    starts up to ``overlap`` characters before the end of the previous one, on a
+    word boundary. Works on offsets into content, without splitting it into words.
+    """
+    length = len(content)
+    overlap = max(0, min(overlap, chunk_size // 2))
+    min_size = chunk_size // 2
+    divisor = max(1, chunk_size // 250)  # About one anchor per chunk_size / 4 characters of sentences
+    spans = []
+
+    match = WHITESPACE.match(content)
+    start = match.end() if match else 0
+    while start < length:
+        if length - start <= chunk_size:
+            end = length
+        else:
+            end = _boundary(content, start + min_size, start + chunk_size, divisor)
+
+        # Strip whitespace at the chunk edges so offsets point at text
+        text_end = end
+        while text_end > start and content[text_end - 1].isspace():
+            text_end -= 1
+        if text_end > start:
+            spans.append((start, text_end))
+        if end >= length:
+            break
+
+        next_start = end
+        if overlap:
+            space = content.find(" ", max(end - overlap, start + 1), end)
+            if space != -1:
+                next_start = space
+        match = WHITESPACE.match(content, next_start)
+        start = match.end() if match else next_start
+
+    return spans
+
+
+def chunk_text(content: str, chunk_size: int = 1000, overlap: int = 0) -> List[str]:
+    """Split content into chunks of at most chunk_size characters (see chunk_text_spans)"""
+    return [content[start:end] for start, end in chunk_text_spans(content, chunk_size, overlap)]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the exact-match answer cache: LRU eviction, TTL expiry and keys
+"""
+
+from services import answer_cache
+from services.answer_cache import AnswerCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_evicts_least_recently_used():
+    cache = AnswerCache(max_entries=2, ttl_seconds=0)
+    cache.set("a", {"answer": 1})
+    cache.set("b", {"answer": 2})
+    assert cache.get("a") == {"answer": 1}  # "b" is now the least recently used
+
+    cache.set("c", {"answer": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"answer": 1}
+    assert cache.get("c") == {"answer": 3}
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_expires_entries_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache.time, "monotonic", clock)
+    cache = AnswerCache(max_entries=10, ttl_seconds=60)
+    cache.set("a", {"answer": 1})
+
+    clock.now += 59
+    assert cache.get("a") == {"answer": 1}
+    clock.now += 2
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 0
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def test_setting_a_key_again_refreshes_it(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(answer_cache.time, "monotonic", clock)
+    cache = AnswerCache(max_entries=10, ttl_seconds=60)
+    cache.set("a", {"answer": 1})
+    clock.now += 50
+    cache.set("a", {"answer": 2})
+    clock.now += 50
+    assert cache.get("a") == {"answer": 2}
+
+
+def test_disabled_cache_stores_nothing():
+    cache = AnswerCache(max_entries=0)
+    cache.set("a", {"answer": 1})
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_keys_normalize_query_text():
+    key = AnswerCache.make_key("  How do I RESET my password? ", 5, 3)
+    assert key == AnswerCache.make_key("how do i reset my password?", 5, 3)
+    assert key != AnswerCache.make_key("how do i reset my password?", 5, 4)
+    assert key != AnswerCache.make_key("how do i reset my password?", 10, 3)
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
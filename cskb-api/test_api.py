@@ -64,7 +64,7 @@ def test_pdf_ingestion():
             data = {"document_name": "Test Document", "category": "Test"}
             response = requests.post(f"{BASE_URL}/ingest/pdf", files=files, data=data)
             print(f"PDF Ingestion: {response.status_code} - {response.json()}")
-            return response.status_code == 200
+            return response.status_code in (200, 202)  # 202: queued as a background job
             
     except Exception as e:
         print(f"PDF ingestion failed: {e}")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the incremental BM25 keyword index
+"""
+
+from services.bm25_index import BM25Index, tokenize
+
+BILLING = [
+    "Refunds are issued to the original payment method within five business days.",
+    "Invoices are emailed on the first day of every billing cycle.",
+]
+ROUTER = [
+    "Restart the router and update its firmware when the connection drops.",
+    "Refunds for faulty routers need the order number.",
+]
+
+
+def snapshot(index):
+    return (
+        {term: dict(postings) for term, postings in index.postings.items()},
+        dict(index.chunk_lengths),
+        index.total_length,
+    )
+
+
+def test_tokenize_lowercases_words():
+    assert tokenize("Reset your PASSWORD, then log-in!") == ["reset", "your", "password", "then", "log", "in"]
+
+
+def test_search_ranks_matching_chunks():
+    index = BM25Index()
+    index.add_document("billing", BILLING)
+    index.add_document("router", ROUTER)
+
+    results = index.search("router firmware", limit=5)
+    assert results[0][0] == ("router", 0)
+    assert all(score > 0 for _, score in results)
+    assert index.search("nonexistent", limit=5) == []
+
+
+def test_remove_restores_the_previous_index():
+    index = BM25Index()
+    index.add_document("billing", BILLING)
+    before = snapshot(index)
+
+    index.add_document("router", ROUTER)
+    index.remove_document("router")
+    assert snapshot(index) == before
+    assert index.stats() == {"documents": 1, "chunks": 2, "terms": len(before[0])}
+
+    index.remove_document("billing")
+    assert snapshot(index) == ({}, {}, 0)
+    assert index.search("refunds", limit=5) == []
+
+
+def test_removal_leaves_other_documents_scores_unchanged():
+    reference = BM25Index()
+    reference.add_document("billing", BILLING)
+
+    index = BM25Index()
+    index.add_document("router", ROUTER)
+    index.add_document("billing", BILLING)
+    index.remove_document("router")
+
+    assert index.search("refunds payment", limit=5) == reference.search("refunds payment", limit=5)
+
+
+def test_adding_a_document_again_replaces_its_chunks():
+    index = BM25Index()
+    index.add_document("billing", BILLING)
+    index.add_document("billing", BILLING[:1])
+
+    assert index.stats()["chunks"] == 1
+    assert index.search("invoices", limit=5) == []
+
+
+def test_removing_an_unknown_document_is_a_no_op():
+    index = BM25Index()
+    index.add_document("billing", BILLING)
+    before = snapshot(index)
+    index.remove_document("missing")
+    assert snapshot(index) == before
+
+
+def test_search_restricted_to_documents():
+    index = BM25Index()
+    index.add_document("billing", BILLING)
+    index.add_document("router", ROUTER)
+
+    results = index.search("refunds", limit=5, document_ids={"router"})
+    assert [key for key, _ in results] == [("router", 1)]
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for splitting extracted text into chunks: size bounds, overlap and
+content-defined boundaries
+"""
+
+from services.text_extraction import chunk_text, chunk_text_spans, split_page_ranges
+
+TOPICS = ["refund", "invoice", "password", "shipping", "warranty", "router", "billing", "account"]
+
+
+def paragraph(topic, count=12):
+    return " ".join(f"The {topic} policy covers case {i} for {topic} requests." for i in range(count))
+
+
+TEXT = "\n\n".join(paragraph(topic) for topic in TOPICS)
+
+
+def test_chunks_respect_size_bounds():
+    spans = chunk_text_spans(TEXT, chunk_size=400)
+    assert len(spans) > 1
+    for start, end in spans:
+        assert end - start <= 400
+    # Every chunk but the last is at least half the chunk size
+    for start, end in spans[:-1]:
+        assert end - start >= 200
+
+
+def test_chunks_cover_the_text_without_edge_whitespace():
+    spans = chunk_text_spans(TEXT, chunk_size=400)
+    for start, end in spans:
+        assert not TEXT[start].isspace() and not TEXT[end - 1].isspace()
+    for (_, end), (next_start, _) in zip(spans, spans[1:]):
+        assert TEXT[end:next_start].strip() == ""
+    assert spans[0][0] == 0 and spans[-1][1] == len(TEXT)
+
+
+def test_overlap_repeats_the_end_of_the_previous_chunk():
+    spans = chunk_text_spans(TEXT, chunk_size=400, overlap=60)
+    for (start, end), (next_start, _) in zip(spans, spans[1:]):
+        assert start < next_start < end
+        assert end - next_start <= 60
+        assert TEXT[next_start - 1] == " "  # Starts on a word boundary
+
+
+def test_overlap_is_capped_at_half_the_chunk_size():
+    spans = chunk_text_spans(TEXT, chunk_size=400, overlap=1000)
+    for (_, end), (next_start, _) in zip(spans, spans[1:]):
+        assert end - next_start <= 200
+
+
+def test_edit_does_not_move_later_boundaries():
+    edited = TEXT.replace("case 3 for refund", "case 3 (updated) for refund")
+    original = chunk_text(TEXT, chunk_size=400)
+    changed = chunk_text(edited, chunk_size=400)
+    assert original[0] != changed[0]
+    assert original[-4:] == changed[-4:]
+
+
+def test_text_without_boundaries_is_cut_at_the_size():
+    spans = chunk_text_spans("x" * 1050, chunk_size=500)
+    assert spans == [(0, 500), (500, 1000), (1000, 1050)]
+
+
+def test_short_and_empty_text():
+    assert chunk_text("  Just one line.  ", chunk_size=400) == ["Just one line."]
+    assert chunk_text_spans("   \n\n ", chunk_size=400) == []
+
+
+def test_split_page_ranges():
+    assert split_page_ranges(10, 3) == [(0, 4), (4, 7), (7, 10)]
+    assert split_page_ranges(2, 8) == [(0, 1), (1, 2)]
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
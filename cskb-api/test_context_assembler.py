@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for packing retrieved chunks into the prompt's token budget
+"""
+
+from services.context_assembler import ContextAssembler, estimate_tokens
+
+
+def sentences(topic, count):
+    return " ".join(f"The {topic} rule number {i} applies to every {topic} request." for i in range(count))
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_chunks_are_taken_by_score_within_budget():
+    assembler = ContextAssembler(token_budget=1000)
+    chunks = [("low", sentences("refund", 2), 0.2), ("high", sentences("invoice", 2), 0.9)]
+    selected, used = assembler.assemble(chunks)
+
+    assert [chunk.item for chunk in selected] == ["high", "low"]
+    assert not any(chunk.truncated for chunk in selected)
+    assert used == sum(chunk.tokens for chunk in selected)
+
+
+def test_first_chunk_over_budget_is_trimmed_at_a_sentence_and_ends_assembly():
+    assembler = ContextAssembler(token_budget=60)
+    first = sentences("refund", 3)
+    second = sentences("invoice", 4)
+    selected, used = assembler.assemble([("a", first, 0.9), ("b", second, 0.8), ("c", sentences("shipping", 1), 0.1)])
+
+    assert [chunk.item for chunk in selected] == ["a", "b"]
+    trimmed = selected[1]
+    assert trimmed.truncated
+    assert trimmed.content.endswith(".")
+    assert second.startswith(trimmed.content)
+    assert used <= 60
+
+
+def test_near_duplicates_are_skipped():
+    assembler = ContextAssembler(token_budget=1000, duplicate_threshold=0.8)
+    text = sentences("password", 4)
+    selected, _ = assembler.assemble([("a", text, 0.9), ("copy", text + " Thanks.", 0.8), ("b", sentences("router", 2), 0.7)])
+    assert [chunk.item for chunk in selected] == ["a", "b"]
+
+
+def test_best_chunk_without_short_sentence_is_cut_rather_than_dropped():
+    assembler = ContextAssembler(token_budget=10)
+    content = "word " * 200  # No sentence boundary at all
+    selected, used = assembler.assemble([("a", content, 0.9)])
+
+    assert len(selected) == 1
+    assert selected[0].truncated
+    assert len(selected[0].content) == 40
+    assert used <= 10
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental document updates: unchanged chunks keep their rows but
+report their position in the new version
+"""
+
+import asyncio
+
+from conftest import ingest_text, use_text
+from services.pdf_service import PDFService
+
+TOPICS = ["refund", "invoice", "password", "shipping", "warranty"]
+
+
+def paragraph(topic: str) -> str:
+    return " ".join(f"The {topic} policy covers case {i} for {topic} requests." for i in range(14))
+
+
+def test_update_reports_current_chunk_positions(knowledge_service):
+    knowledge_service.chunk_overlap = 0
+    version_1 = "\n\n".join(paragraph(topic) for topic in TOPICS)
+    # A new first paragraph moves every existing chunk one position down
+    version_2 = "\n\n".join(paragraph(topic) for topic in ["holiday"] + TOPICS)
+
+    async def run():
+        await ingest_text(knowledge_service, "guide", version_1)
+        use_text(knowledge_service, version_2)
+        stats = await knowledge_service.update_document_in_knowledge_base("guide", "guide.pdf")
+        search = await knowledge_service.search("warranty policy", max_results=10)
+        return stats, search["results"]
+
+    stats, results = asyncio.run(run())
+    assert stats["chunks"] == len(TOPICS) + 1
+    assert stats["chunks_embedded"] == 1  # Only the new paragraph
+    assert len(results) == len(TOPICS) + 1
+
+    ids = [result["id"] for result in results]
+    assert len(set(ids)) == len(ids)
+
+    for result in results:
+        meta_data = result["meta_data"]
+        position = meta_data["chunk_id"]
+        assert result["id"] == f"guide_chunk_{position}"
+        assert result["name"] == f"Customer Support Guide - Chunk {position + 1}"
+        assert version_2[meta_data["start_offset"]:meta_data["end_offset"]] == result["content"]
+        assert result["content"].startswith(f"The {(['holiday'] + TOPICS)[position]} policy")
+
+
+
+def test_document_locks_are_released(knowledge_service, tmp_path):
+    pdf_service = PDFService()
+    pdf_service.upload_dir = tmp_path / "uploads"
+    pdf_service.upload_dir.mkdir()
+    pdf_service.set_knowledge_service(knowledge_service)
+    version_1 = tmp_path / "guide.pdf"
+    version_1.write_bytes(b"%PDF version 1")
+    version_2 = tmp_path / "guide-2.pdf"
+    version_2.write_bytes(b"%PDF version 2")
+
+    async def run():
+        use_text(knowledge_service, "\n\n".join(paragraph(topic) for topic in TOPICS))
+        await pdf_service.process_and_ingest_pdf(str(version_1), "Guide", document_id="guide")
+        assert pdf_service._update_locks == {}
+
+        use_text(knowledge_service, "\n\n".join(paragraph(topic) for topic in TOPICS[1:]))
+        update = asyncio.create_task(pdf_service.update_document("guide", str(version_2)))
+        await asyncio.sleep(0)
+        # The delete waits for the update and shares its lock meanwhile
+        removed = await pdf_service.remove_document("guide")
+        await update
+        return removed
+
+    assert asyncio.run(run())
+    assert knowledge_service.get_document("guide") is None
+    assert pdf_service._update_locks == {}
+    assert pdf_service._update_lock_users == {}
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
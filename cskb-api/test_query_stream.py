@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for /query/stream: the final done event carries the same payload as /query
+"""
+
+import asyncio
+import contextlib
+
+from agno.run.response import RunResponse, RunResponseContentEvent
+
+from conftest import ingest_text
+
+CREATED_AT = 1718000000
+ANSWER = ["Refunds take ", "five business days."]
+
+
+class FakeAgent:
+    """Answers every prompt with ANSWER, like an agno Agent run"""
+
+    def __init__(self):
+        self.run_response = None
+
+    async def arun(self, prompt, stream=False):
+        self.run_response = RunResponse(content="".join(ANSWER), created_at=CREATED_AT)
+        if not stream:
+            return self.run_response
+
+        async def events():
+            for part in ANSWER:
+                yield RunResponseContentEvent(content=part, created_at=CREATED_AT + 1)
+        return events()
+
+
+def test_done_event_matches_query_response(knowledge_service):
+    knowledge_service.answer_cache.max_entries = 0
+    knowledge_service.semantic_cache = None
+
+    @contextlib.asynccontextmanager
+    async def acquire(user_id="default_user"):
+        yield FakeAgent()
+    knowledge_service.agent_pool.acquire = acquire
+
+    async def run():
+        await ingest_text(knowledge_service, "billing", "Refunds are issued within five business days. " * 20)
+        answer = await knowledge_service.query("How long do refunds take?")
+        events = [event async for event in knowledge_service.query_stream("How long do refunds take?")]
+        return answer, events
+
+    answer, events = asyncio.run(run())
+    assert [name for name, _ in events] == ["sources", "token", "token", "done"]
+    done = events[-1][1]
+    assert answer["timestamp"] is not None
+    assert done == answer
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
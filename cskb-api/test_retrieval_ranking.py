@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the reciprocal-rank fusion of vector and full-text search
+"""
+
+import asyncio
+
+from conftest import fake_embedding, ingest_text
+from services.embeddings import cosine_similarity
+
+BILLING_GUIDE = " ".join([
+    "Refunds are issued to the original payment method within five business days.",
+    "Invoices are emailed on the first day of every billing cycle.",
+    "Annual subscriptions can be cancelled for a prorated refund within thirty days.",
+] * 12)
+
+TROUBLESHOOTING_GUIDE = " ".join([
+    "If the router keeps dropping the connection, restart it and update its firmware.",
+    "Clear the browser cache when the dashboard does not load after a release.",
+] * 12)
+
+
+def test_rrf_fuses_vector_and_keyword_ranks(knowledge_service):
+    async def run():
+        await ingest_text(knowledge_service, "billing", BILLING_GUIDE, category="Billing")
+        await ingest_text(knowledge_service, "troubleshooting", TROUBLESHOOTING_GUIDE, category="Technical")
+        return await asyncio.to_thread(knowledge_service._search_rrf, "prorated refund for annual subscriptions", 3)
+
+    results = asyncio.run(run())
+    assert results
+
+    top = results[0]
+    scores = top.meta_data["scores"]
+    # The full-text index works, so the best chunk was found by both searches
+    assert scores["vector_rank"] == 1
+    assert scores["keyword_rank"] == 1
+    assert top.meta_data["document_id"] == "billing"
+
+    # The vector score is the cosine similarity LanceDB computed for the row
+    expected = cosine_similarity(fake_embedding("prorated refund for annual subscriptions"), top.embedding)
+    assert abs(scores["vector_score"] - expected) < 1e-3
+
+
+def test_shared_chunk_is_copied_and_returned_once(knowledge_service):
+    knowledge_service.chunk_overlap = 0
+    shared = " ".join(f"Warranty claims need the order number, case {i}." for i in range(20))
+    billing = BILLING_GUIDE + "\n\n" + shared
+    troubleshooting = TROUBLESHOOTING_GUIDE + "\n\n" + shared
+
+    async def run():
+        await ingest_text(knowledge_service, "billing", billing)
+        stats = await ingest_text(knowledge_service, "troubleshooting", troubleshooting)
+        search = await knowledge_service.search("warranty claims order number", max_results=10)
+        return stats, search["results"]
+
+    stats, results = asyncio.run(run())
+    # The shared chunk's vector comes from the billing row, not from the embedder
+    assert stats["chunks_copied"] >= 1
+    assert stats["chunks_embedded"] + stats["chunks_copied"] + stats["chunks_cached"] == stats["rows_added"]
+
+    warranty = [result for result in results if result["content"].startswith("Warranty claims")]
+    assert len(warranty) == 1
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
+
+
+def test_keyword_search_ignores_metadata(knowledge_service):
+    async def run():
+        await ingest_text(knowledge_service, "billing", BILLING_GUIDE, category="Billing")
+        await ingest_text(knowledge_service, "troubleshooting", TROUBLESHOOTING_GUIDE, category="Technical")
+        return await asyncio.to_thread(knowledge_service._search_rrf, "technical", 5)
+
+    results = asyncio.run(run())
+    # "technical" is only the category of a document, never in its text
+    assert all(result.meta_data["scores"].get("keyword_rank") is None for result in results)
+    assert knowledge_service.index_manager.fts_index().columns == ["content"]
+    assert knowledge_service.index_manager._find_index("payload") is None
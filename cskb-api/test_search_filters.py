@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for metadata filters: SQL prefilter generation and in-memory matching
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from services.search_filters import SearchFilters, sql_string
+
+
+def test_no_filters_is_none():
+    assert SearchFilters.create() is None
+
+
+def test_sql_string_escapes_quotes():
+    assert sql_string("Billing") == "'Billing'"
+    assert sql_string("Customer's guide") == "'Customer''s guide'"
+    assert sql_string("' OR 1=1 --") == "''' OR 1=1 --'"
+
+
+def test_conditions_are_combined_with_and():
+    filters = SearchFilters.create(
+        category="Billing",
+        document_ids=["b", "a", "b"],
+        uploaded_after=datetime(2024, 1, 1),
+        uploaded_before=datetime(2024, 6, 30, 12, 30)
+    )
+    assert filters.where_clause() == (
+        "category = 'Billing'"
+        " AND document_id IN ('a', 'b')"
+        " AND uploaded_at >= timestamp '2024-01-01 00:00:00'"
+        " AND uploaded_at <= timestamp '2024-06-30 12:30:00'"
+    )
+
+
+def test_single_condition():
+    assert SearchFilters.create(category="O'Brien").where_clause() == "category = 'O''Brien'"
+    assert SearchFilters.create(document_ids=["x'y"]).where_clause() == "document_id IN ('x''y')"
+
+
+def test_empty_document_list_matches_nothing():
+    filters = SearchFilters.create(document_ids=[])
+    assert filters.where_clause() == "false"
+    assert not filters.matches({"id": "a"})
+
+
+def test_aware_datetimes_are_converted_to_utc():
+    filters = SearchFilters.create(uploaded_after=datetime(2024, 1, 1, 2, 0, tzinfo=timezone(timedelta(hours=2))))
+    assert filters.uploaded_after == datetime(2024, 1, 1)
+    assert filters.where_clause() == "uploaded_at >= timestamp '2024-01-01 00:00:00'"
+
+
+def test_matches_documents():
+    filters = SearchFilters.create(category="Billing", uploaded_after=datetime(2024, 1, 1))
+    assert filters.matches({"id": "a", "category": "Billing", "uploaded_at": "2024-02-01T00:00:00"})
+    assert not filters.matches({"id": "a", "category": "Technical", "uploaded_at": "2024-02-01T00:00:00"})
+    assert not filters.matches({"id": "a", "category": "Billing", "uploaded_at": "2023-12-31T23:59:59"})
+    assert not filters.matches({"id": "a", "category": "Billing"})
+
+
+def test_filters_are_hashable_and_order_independent():
+    first = SearchFilters.create(document_ids=["a", "b"])
+    second = SearchFilters.create(document_ids=["b", "a"])
+    assert first == second and hash(first) == hash(second)
+    assert first.to_dict()["document_ids"] == ["a", "b"]
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for SingleFlight: concurrent calls with the same key share one computation
+"""
+
+import asyncio
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_the_result():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", compute) for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False), ("answer", True), ("answer", True)]
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 2}
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    async def run():
+        return await asyncio.gather(
+            flight.do("a", lambda: asyncio.sleep(0.01, result="a")),
+            flight.do("b", lambda: asyncio.sleep(0.01, result="b")),
+        )
+
+    assert asyncio.run(run()) == [("a", False), ("b", False)]
+    assert flight.executed == 2
+
+
+def test_followers_get_the_leaders_exception():
+    flight = SingleFlight()
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("embedding failed")
+
+    async def run():
+        return await asyncio.gather(
+            flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_next_call_after_a_failure_runs_again():
+    flight = SingleFlight()
+
+    async def fail():
+        raise ValueError("embedding failed")
+
+    async def run():
+        with pytest.raises(ValueError):
+            await flight.do("key", fail)
+        return await flight.do("key", lambda: asyncio.sleep(0, result="retried"))
+
+    assert asyncio.run(run()) == ("retried", False)
+
+
+def test_follower_takes_over_when_the_leader_is_cancelled():
+    flight = SingleFlight()
+
+    async def run():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.Event().wait()
+
+        leader = asyncio.create_task(flight.do("key", hang))
+        await started.wait()
+        follower = asyncio.create_task(flight.do("key", lambda: asyncio.sleep(0, result="own")))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    # The follower ran its own computation instead of failing with the leader
+    assert asyncio.run(run()) == ("own", False)
+    assert flight.stats() == {"in_flight": 0, "executed": 2, "coalesced": 0}
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the startup migration of knowledge base tables created before the
+document columns and the content column existed
+"""
+
+from agno.document import Document
+from agno.vectordb.lancedb import LanceDb
+from agno.vectordb.search import SearchType
+
+from conftest import close_knowledge_service, make_knowledge_service
+
+
+def create_baseline_table(documents):
+    """Store chunks the way the original service did: LanceDb rows with the document in the payload"""
+    vector_db = LanceDb(
+        table_name="customer_support_kb",
+        uri="data/lancedb",
+        search_type=SearchType.hybrid,
+        use_tantivy=False,
+    )
+    vector_db.create()
+    vector_db.insert(documents)
+    return vector_db.table.count_rows()
+
+
+def baseline_chunk(document_id, i, content):
+    meta_data = {"source_file": "guide.pdf", "chunk_id": i, "chunk_size": len(content)}
+    if document_id:
+        meta_data["document_id"] = document_id
+    return Document(content=content, id=f"{document_id}_chunk_{i}", name=f"Customer Support Guide - Chunk {i + 1}", meta_data=meta_data)
+
+
+def test_migration_keeps_baseline_rows(service_environment):
+    rows = create_baseline_table([
+        baseline_chunk("billing", 0, "Refunds are issued within five business days."),
+        baseline_chunk("billing", 1, "Invoices are emailed on the first day of every cycle."),
+        baseline_chunk("setup", 0, "Restart the router and update its firmware."),
+        baseline_chunk(None, 0, "A chunk stored without a document."),
+    ])
+    assert rows == 4
+
+    service = make_knowledge_service()
+    try:
+        table = service.vector_db.table
+        assert table.count_rows() == rows
+        assert table.count_rows("document_id = 'billing'") == 2
+        assert table.count_rows("document_id = 'setup'") == 1
+        assert table.count_rows("document_id IS NULL") == 1
+        # The chunk text is copied out of the payload for the full-text index
+        assert table.count_rows("content IS NULL") == 0
+        contents = table.search().where("document_id = 'setup'").select(["content"]).to_list()
+        assert contents[0]["content"] == "Restart the router and update its firmware."
+    finally:
+        close_knowledge_service(service)
+
+
+def test_migration_can_drop_unowned_rows(service_environment, monkeypatch):
+    create_baseline_table([
+        baseline_chunk("billing", 0, "Refunds are issued within five business days."),
+        baseline_chunk(None, 0, "A chunk stored without a document."),
+    ])
+    monkeypatch.setattr("config.MIGRATION_DROP_UNOWNED_ROWS", True)
+
+    service = make_knowledge_service()
+    try:
+        table = service.vector_db.table
+        assert table.count_rows() == 1
+        assert table.count_rows("document_id = 'billing'") == 1
+    finally:
+        close_knowledge_service(service)
+
+
+if __name__ == "__main__":
+    import pytest
+    raise SystemExit(pytest.main([__file__, "-q"]))